@@ -1,155 +1,467 @@
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 import os
 
-from app.db.session import get_db
-from app.services.pdf_processor import process_pdf
-from app.schemas.paper import Paper, PaperCreate
+from app.db.session import get_async_db, get_db
+from app.schemas.paper import Paper, PaperBulkDelete, PaperBulkDeleteResult, PaperCreate
 from app.schemas.entity import Entity, EntityCreate
-from app.services import crud
+from app.schemas.job import Job
+from app.core.config import settings
+from app.services import crud_async, document_store, fulltext, jobs, paper_query, pdf_processor, response_cache, storage
+from app.services.graph import knowledge_graph
+from app.services.suggest import entity_suggester
 
 router = APIRouter()
 
-@router.post("/papers/upload/")
+@router.post("/papers/upload/", response_model=Job, status_code=202)
 async def upload_pdf(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    上传PDF文件并处理
+    上传PDF文件，创建后台处理任务并立即返回任务信息
     """
-    if not file.filename.endswith('.pdf'):
+    # 只保留文件名部分，防止 ../ 等路径写到上传目录之外
+    file_name = os.path.basename((file.filename or "").replace("\\", "/"))
+    if not file_name.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="只能上传PDF文件")
     
+    tmp_path = None
     try:
-        # 创建上传目录
-        os.makedirs("papers", exist_ok=True)
+        # 流式写入临时文件并计算内容哈希，不在内存中缓存整个文件；
+        # 临时文件与产物目录位于同一文件系统，之后可以原子地移动
+        tmp_path, content_hash = await storage.save_upload(file, settings.STORE_DIR)
+        
+        # 相同内容已处理过：直接返回已完成的任务，不再重复处理
+        paper = await crud_async.get_paper_by_hash(db, content_hash)
+        if paper is not None:
+            return await crud_async.create_job(
+                db,
+                file_name=file_name,
+                file_path=paper.paper_pdf,
+                content_hash=content_hash,
+                status="done",
+                stage="done",
+                progress=100,
+                paper_id=paper.paper_id
+            )
+        
+        # 相同内容正在处理中：返回该任务
+        job = await crud_async.get_active_job(db, content_hash=content_hash)
+        if job is not None:
+            return job
+        
+        # 同名但内容不同的文档在处理前就拒绝
+        paper_name = os.path.splitext(file_name)[0]
+        if await crud_async.get_paper_by_name(db, paper_name) is not None:
+            raise HTTPException(status_code=409, detail="同名文档已存在")
         
-        # 保存文件
-        file_path = os.path.join("papers", file.filename)
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # 先创建任务占用文件名：同名的未结束任务由唯一索引拒绝，
+        # 并发上传同名文件时只有一个请求能插入成功
+        file_path = storage.artifact_path(content_hash, "pdf")
+        try:
+            job = await crud_async.create_job(
+                db,
+                file_name=file_name,
+                file_path=file_path,
+                content_hash=content_hash
+            )
+        except IntegrityError:
+            await db.rollback()
+            job = await crud_async.get_active_job(db, content_hash=content_hash)
+            if job is not None:
+                return job
+            raise HTTPException(status_code=409, detail="同名文档已存在")
         
-        # 处理PDF文件
-        paper_data = await process_pdf(file_path, db)
-        return paper_data
+        # 按内容哈希保存文件，已存在时（如之前处理失败）直接复用
+        os.makedirs(storage.artifact_dir(content_hash), exist_ok=True)
+        if not os.path.exists(file_path):
+            os.replace(tmp_path, file_path)
+            tmp_path = None
+        jobs.submit_job(job.job_id)
+        return job
         
+    except storage.UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+@router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    查询后台处理任务的状态和进度
+    """
+    job = await crud_async.get_job(db, job_id=job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
 
 @router.get("/papers/")
-def get_papers(
+async def get_papers(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    获取所有论文列表（按语料版本缓存，支持 If-None-Match）
+    """
+    return await response_cache.respond(
+        request,
+        "papers",
+        await crud_async.get_corpus_version(db),
+        {"skip": skip, "limit": limit},
+        lambda: crud_async.get_papers(db, skip=skip, limit=limit)
+    )
+
+@router.get("/papers/fulltext/")
+async def search_fulltext(
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    获取所有论文列表
+    全文检索论文，按 BM25 相关度排序并返回高亮片段
     """
-    papers = crud.get_papers(db, skip=skip, limit=limit)
-    return papers
+    if not fulltext.is_supported(db.bind):
+        raise HTTPException(status_code=501, detail="当前数据库不支持全文检索")
+    try:
+        results = await crud_async.search_fulltext(db, q, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"查询格式不正确: {str(e)}")
+    
+    names = await crud_async.get_paper_names(db, [result["paper_id"] for result in results])
+    for result in results:
+        result["paper_name"] = names.get(result["paper_id"])
+    return results
 
 @router.get("/papers/{paper_id}")
-def get_paper(
+async def get_paper(
     paper_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取单个论文详情
     """
-    paper = crud.get_paper(db, paper_id=paper_id)
+    paper = await crud_async.get_paper(db, paper_id=paper_id)
     if paper is None:
         raise HTTPException(status_code=404, detail="论文不存在")
     return paper
 
+@router.get("/papers/{paper_id}/docx")
+async def get_paper_docx(
+    paper_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    下载论文的DOCX文件（不存在时按需转换生成）
+    """
+    paper = await crud_async.get_paper(db, paper_id=paper_id)
+    if paper is None:
+        raise HTTPException(status_code=404, detail="论文不存在")
+    try:
+        docx_path = paper.paper_docx
+        if not os.path.exists(docx_path):
+            await jobs.run_exclusive(docx_path, pdf_processor.ensure_docx, paper.paper_pdf, docx_path)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"生成DOCX失败: {str(e)}")
+    return FileResponse(docx_path, filename=os.path.basename(docx_path))
+
+async def _ensure_json(paper) -> str:
+    """返回论文简化文档的 NDJSON 路径，不存在时交给后台进程池生成"""
+    path = document_store.content_path(paper.paper_json)
+    if not document_store.exists(path):
+        await jobs.run_exclusive(
+            path, pdf_processor.ensure_json, paper.paper_pdf, paper.paper_docx, paper.paper_json
+        )
+    return path
+
+@router.get("/papers/{paper_id}/json")
+async def get_paper_json(
+    paper_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    获取论文的完整简化JSON（不存在时按需生成），按块流式输出
+    """
+    paper = await crud_async.get_paper(db, paper_id=paper_id)
+    if paper is None:
+        raise HTTPException(status_code=404, detail="论文不存在")
+    try:
+        json_path = await _ensure_json(paper)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"生成JSON失败: {str(e)}")
+    return StreamingResponse(document_store.iter_document_json(json_path), media_type="application/json")
+
+@router.get("/papers/{paper_id}/content")
+async def get_paper_content(
+    paper_id: int,
+    start: int = Query(0, alias="from", ge=0),
+    end: Optional[int] = Query(None, alias="to", ge=0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    按块读取论文简化文档的第 [from, to) 个顶层块（段落、表格等），
+    只读取请求范围对应的字节；to 缺省或范围过大时最多返回 document_store.MAX_RANGE 个块
+    简化文档由 DOCX 转换生成，与实体位置的偏移不对应；按实体位置定位文本请用 /paragraphs
+    """
+    paper = await crud_async.get_paper(db, paper_id=paper_id)
+    if paper is None:
+        raise HTTPException(status_code=404, detail="论文不存在")
+    try:
+        path = await _ensure_json(paper)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"生成JSON失败: {str(e)}")
+    
+    end = min(end if end is not None else start + document_store.MAX_RANGE, start + document_store.MAX_RANGE)
+    blocks = await run_in_threadpool(document_store.read_blocks, path, start, end)
+    return {
+        "paper_id": paper_id,
+        "total": document_store.block_count(path),
+        "from": start,
+        "to": start + len(blocks),
+        "blocks": blocks
+    }
+
+@router.get("/papers/{paper_id}/paragraphs")
+async def get_paper_paragraphs(
+    paper_id: int,
+    start: int = Query(0, alias="from", ge=0),
+    end: Optional[int] = Query(None, alias="to", ge=0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    读取实体识别所用段落文本的第 [from, to) 段，最多返回 document_store.MAX_RANGE 段
+    每段附带其在全文中的起始偏移 start_char，/mentions/ 的偏移即相对于这份全文
+    """
+    paper = await crud_async.get_paper(db, paper_id=paper_id)
+    if paper is None:
+        raise HTTPException(status_code=404, detail="论文不存在")
+    paragraphs = None
+    if paper.content_hash:
+        paragraphs = await run_in_threadpool(pdf_processor.load_paragraphs, paper.content_hash)
+    if paragraphs is None:
+        raise HTTPException(status_code=404, detail="论文的段落文本不存在")
+    
+    end = min(end if end is not None else start + document_store.MAX_RANGE, start + document_store.MAX_RANGE)
+    offset = sum(len(paragraph) for paragraph in paragraphs[:start])
+    items = []
+    for paragraph in paragraphs[start:end]:
+        items.append({"start_char": offset, "text": paragraph})
+        offset += len(paragraph)
+    return {
+        "paper_id": paper_id,
+        "total": len(paragraphs),
+        "from": start,
+        "to": start + len(items),
+        "paragraphs": items
+    }
+
+@router.get("/papers/{paper_id}/mentions/")
+async def get_paper_mentions(
+    paper_id: int,
+    entity_id: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    获取论文中实体出现的位置，可限定某个实体；
+    after 为上一页最后一条的 start_char
+    偏移相对于 /paragraphs 返回的段落文本直接拼接后的全文，而不是 /content 的简化文档
+    """
+    if await crud_async.get_paper(db, paper_id=paper_id) is None:
+        raise HTTPException(status_code=404, detail="论文不存在")
+    return await crud_async.get_mentions(
+        db,
+        paper_id=paper_id,
+        entity_id=entity_id,
+        after=after,
+        limit=limit
+    )
+
 @router.get("/entities/")
-def get_entities(
-    skip: int = 0,
+async def get_entities(
+    request: Request,
+    after_id: Optional[int] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    获取实体列表，使用 after_id（上一页最后一个实体ID）翻页（按语料版本缓存）
+    """
+    return await response_cache.respond(
+        request,
+        "entities",
+        await crud_async.get_corpus_version(db),
+        {"after_id": after_id, "limit": limit},
+        lambda: crud_async.get_entities(db, after_id=after_id, limit=limit)
+    )
+
+@router.get("/statistics/")
+async def get_statistics(
+    request: Request,
+    top: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    获取所有实体列表
+    实体类型统计与出现在最多论文中的 top 个实体（按语料版本缓存）
     """
-    entities = crud.get_entities(db, skip=skip, limit=limit)
-    return entities
+    return await response_cache.respond(
+        request,
+        "statistics",
+        await crud_async.get_corpus_version(db),
+        {"top": top},
+        lambda: crud_async.get_entity_statistics(db, limit=top)
+    )
 
 @router.get("/entities/search/")
-def search_entities(
+async def search_entities(
     query: str,
     entity_type: str = None,
-    db: Session = Depends(get_db)
+    prefix: bool = False,
+    limit: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    搜索实体
+    搜索实体（不区分大小写），prefix=true 时只匹配名称前缀
     """
-    results = crud.search_entities(db, query=query, entity_type=entity_type)
+    results = await crud_async.search_entities(
+        db,
+        query=query,
+        entity_type=entity_type,
+        prefix=prefix,
+        limit=limit
+    )
     return results
 
+# 图谱与自动补全维护进程内的共享索引（由线程锁保护），
+# 这些接口保持同步处理函数，由 FastAPI 放到线程池中执行，不阻塞事件循环
+@router.get("/entities/suggest/")
+def suggest_entities(
+    prefix: str,
+    entity_type: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    实体名称自动补全：返回名称以 prefix 开头的实体，按出现的论文数排序
+    """
+    knowledge_graph.sync(db)
+    return entity_suggester.suggest(prefix, limit=limit, entity_type=entity_type)
+
 @router.get("/graph/")
 def get_knowledge_graph(
+    request: Request,
+    entity_type: Optional[str] = None,
+    min_count: int = Query(1, ge=1),
+    limit: Optional[int] = Query(None, ge=1),
     db: Session = Depends(get_db)
 ):
     """
     获取知识图谱数据
+    图在内存中增量维护，客户端可通过 If-None-Match 获得 304 响应；
+    可按实体类型、最小出现次数裁剪，并按权重只保留前 limit 条边
     """
-    nodes = []
-    edges = []
-    
-    # 获取所有论文和实体
-    papers = crud.get_papers(db)
-    entities = crud.get_entities(db)
-    
-    # 构建节点
-    for paper in papers:
-        nodes.append({
-            "id": f"p{paper.paper_id}",
-            "label": paper.paper_name,
-            "type": "paper"
-        })
+    knowledge_graph.sync(db)
+    if entity_type or min_count > 1 or limit:
+        return response_cache.respond_sync(
+            request,
+            "graph",
+            knowledge_graph.version,
+            {"entity_type": entity_type, "min_count": min_count, "limit": limit},
+            lambda: knowledge_graph.subgraph(entity_type=entity_type, min_count=min_count, limit=limit)
+        )
+    etag, payload = knowledge_graph.snapshot()
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=payload, media_type="application/json", headers={"ETag": etag})
+
+@router.get("/graph/neighborhood/")
+def get_graph_neighborhood(
+    node: str,
+    hops: int = Query(1, ge=1, le=3),
+    entity_type: Optional[str] = None,
+    min_count: int = Query(1, ge=1),
+    limit: Optional[int] = Query(500, ge=1),
+    db: Session = Depends(get_db)
+):
+    """
+    获取某篇论文（p<ID>）或实体（e<ID>）的 k 跳邻域子图
+    """
+    knowledge_graph.sync(db)
+    try:
+        if not knowledge_graph.has_node(node):
+            raise HTTPException(status_code=404, detail="节点不存在")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return knowledge_graph.neighborhood(
+        node,
+        hops=hops,
+        entity_type=entity_type,
+        min_count=min_count,
+        limit=limit
+    )
+
+@router.post("/papers/bulk-delete/", response_model=PaperBulkDeleteResult)
+async def bulk_delete_papers(
+    criteria: PaperBulkDelete,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    批量删除论文：按ID列表、名称前缀或查询语句选择（同时给出时取交集）
+    数据库记录在一个事务中删除，文件在后台删除
+    """
+    if criteria.paper_ids is None and not criteria.name_prefix and not criteria.query:
+        raise HTTPException(status_code=400, detail="请至少指定一个删除条件")
     
-    for entity in entities:
-        nodes.append({
-            "id": f"e{entity.entity_id}",
-            "label": entity.entity_name,
-            "type": entity.entity_type
-        })
-        
-        # 构建边
-        for paper in entity.papers:
-            edges.append({
-                "source": f"p{paper.paper_id}",
-                "target": f"e{entity.entity_id}",
-                "value": 1  # 可以用count值
-            })
+    selected = None
+    if criteria.paper_ids is not None or criteria.name_prefix:
+        selected = set(await crud_async.find_paper_ids(
+            db, paper_ids=criteria.paper_ids, name_prefix=criteria.name_prefix or None
+        ))
+    if criteria.query:
+        try:
+            matched = await db.run_sync(paper_query.search_papers, criteria.query)
+        except paper_query.QuerySyntaxError as e:
+            raise HTTPException(status_code=400, detail=f"查询格式不正确: {e}")
+        matched_ids = {paper.paper_id for paper in matched}
+        selected = matched_ids if selected is None else selected & matched_ids
     
-    return {
-        "nodes": nodes,
-        "edges": edges
-    }
+    removed = await crud_async.delete_papers(db, sorted(selected))
+    return {"deleted": len(removed), "paper_ids": [paper.paper_id for paper in removed]}
 
 @router.delete("/papers/{paper_id}")
 async def delete_paper_endpoint(
     paper_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    删除论文及其相关文件和关系
+    删除论文及其相关文件和关系，不再关联任何论文的实体在同一事务中删除
     """
-    success = crud.delete_paper(db, paper_id)
+    success = await crud_async.delete_paper(db, paper_id)
     if success:
-        # 清理没有关联的实体
-        crud.cleanup_unused_entities(db)
         return {"message": "文档已删除"}
     else:
         raise HTTPException(status_code=404, detail="文档不存在或删除失败")
 
 @router.get("/papers/search/")
-def search_papers(
+async def search_papers(
     query: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     搜索论文
@@ -158,47 +470,12 @@ def search_papers(
     - get all papers that mention organisation [name]
     - get all papers that mention work [name]
     - get one paper that mention ...
+    - 多个条件用 and / or 连接，and 优先于 or，例如
+      get all papers that mention person [name] and organisation [name] or work [name]
     """
-    query_parts = query.lower().split()
-    if not query_parts or query_parts[0] != "get":
-        raise HTTPException(status_code=400, detail="查询格式不正确")
-    
     try:
-        # 解析查询
-        limit = None
-        if query_parts[1] == "one":
-            limit = 1
-            query_parts.pop(1)
-        
-        if query_parts[1] != "all" or query_parts[2] != "papers" or \
-           query_parts[3] != "that" or query_parts[4] != "mention":
-            raise HTTPException(status_code=400, detail="查询格式不正确")
-        
-        # 获取实体类型和名称
-        entity_type = None
-        if query_parts[5] == "person":
-            entity_type = "PERSON"
-            name_start = 6
-        elif query_parts[5] == "organisation":
-            entity_type = "ORG"
-            name_start = 6
-        elif query_parts[5] == "work":
-            entity_type = "WORK_OF_ART"
-            name_start = 6
-        else:
-            name_start = 5
-        
-        entity_name = " ".join(query_parts[name_start:])
-        
-        # 执行搜索
-        papers = crud.search_papers_by_entity(
-            db,
-            entity_name=entity_name,
-            entity_type=entity_type,
-            limit=limit
-        )
-        
-        return papers
-        
+        return await db.run_sync(paper_query.search_papers, query)
+    except paper_query.QuerySyntaxError as e:
+        raise HTTPException(status_code=400, detail=f"查询格式不正确: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
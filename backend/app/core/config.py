@@ -11,15 +11,58 @@ class Settings(BaseSettings):
         "DATABASE_URL",
         "sqlite:///./data/app.db"
     )
+    # 连接池大小（文件型 SQLite 与 PostgreSQL 等数据库使用 QueuePool）
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # SQLite 写锁等待时间（毫秒）
+    SQLITE_BUSY_TIMEOUT: int = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
     
     # 文件存储路径
     UPLOAD_DIR: str = "papers"
     DOCS_DIR: str = "docs"
     JSON_DIR: str = "json"
     ENTS_DIR: str = "ents"
+    # 按PDF内容哈希存放的处理产物（DOCX/JSON/实体识别结果）
+    STORE_DIR: str = "store"
+    
+    # 上传限制：单个文件最大字节数与流式写入的分块大小
+    MAX_UPLOAD_SIZE: int = int(os.getenv("MAX_UPLOAD_SIZE", str(50 * 1024 * 1024)))
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    
+    # 文本提取方式：pdf（直接从PDF提取，DOCX/JSON按需生成）或 docx（先完整转换为DOCX）
+    EXTRACTION_MODE: str = os.getenv("EXTRACTION_MODE", "pdf")
+    
+    # 页数达到 PAGE_PARALLEL_THRESHOLD 的PDF按页范围拆分，由 PAGE_WORKERS 个进程并行提取/转换
+    PAGE_PARALLEL_THRESHOLD: int = int(os.getenv("PAGE_PARALLEL_THRESHOLD", "40"))
+    PAGE_WORKERS: int = int(os.getenv("PAGE_WORKERS", str(os.cpu_count() or 1)))
     
     # SpaCy模型
     SPACY_MODEL: str = "en_core_web_sm"
+    # 处理进程池以 fork-server 方式启动并预加载模型，子进程写时复制共享
+    PRELOAD_SPACY_MODEL: bool = os.getenv("PRELOAD_SPACY_MODEL", "false").lower() == "true"
+    # nlp.pipe 每批处理的段落数与进程数
+    NER_BATCH_SIZE: int = int(os.getenv("NER_BATCH_SIZE", "64"))
+    NER_N_PROCESS: int = int(os.getenv("NER_N_PROCESS", "1"))
+    
+    # 读接口响应缓存：CACHE_URL 为空时使用进程内 LRU，或设为 redis://host:port/db
+    CACHE_URL: str = os.getenv("CACHE_URL", "")
+    CACHE_TTL: int = int(os.getenv("CACHE_TTL", "300"))
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+    
+    # 请求头 X-Profile: 1 时用 cProfile 分析该请求，结果写入 PROFILE_DIR
+    ENABLE_PROFILING: bool = os.getenv("ENABLE_PROFILING", "false").lower() == "true"
+    PROFILE_DIR: str = "profiles"
+    
+    # 后台处理任务配置
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", "2"))
+    # 运行中的任务每隔 JOB_HEARTBEAT_INTERVAL 秒更新 updated_at；
+    # 超过 JOB_STALE_AFTER 秒没有更新的 running 任务视为执行进程已退出，重新排队
+    JOB_HEARTBEAT_INTERVAL: int = int(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+    JOB_STALE_AFTER: int = int(os.getenv("JOB_STALE_AFTER", "300"))
+    # 删除论文后在后台删除文件的线程数
+    FILE_DELETE_WORKERS: int = int(os.getenv("FILE_DELETE_WORKERS", "4"))
     
     class Config:
         case_sensitive = True
@@ -0,0 +1,226 @@
+"""
+进程内指标（计数器、直方图），以 Prometheus 文本格式在 /metrics 输出
+
+- 处理流程各阶段耗时：stage_timer("ner") 等
+- crud 函数耗时：@timed 装饰器
+- 每个请求执行的 SQL 语句数：SQLAlchemy before_cursor_execute 事件 + contextvar
+后台处理在工作进程中执行，任务结束时把该进程的指标增量带回主进程合并（见 jobs）。
+"""
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+LabelValues = Tuple[str, ...]
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self, reset: bool = False) -> Dict[LabelValues, float]:
+        with self._lock:
+            values = dict(self._values)
+            if reset:
+                self._values.clear()
+        return values
+
+    def merge(self, values: Dict[LabelValues, float]) -> None:
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        return [("", key, value) for key, value in sorted(self.collect().items())]
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # 标签值 -> [各桶计数..., 总和, 总数]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def collect(self, reset: bool = False) -> Dict[LabelValues, List[float]]:
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+            if reset:
+                self._values.clear()
+        return values
+
+    def merge(self, values: Dict[LabelValues, List[float]]) -> None:
+        with self._lock:
+            for key, other in values.items():
+                state = self._values.setdefault(key, [0] * (len(self.buckets) + 2))
+                for i, value in enumerate(other):
+                    state[i] += value
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        samples = []
+        for key, state in sorted(self.collect().items()):
+            for bound, count in zip(self.buckets, state):
+                samples.append(("_bucket", key + (_format_value(bound),), count))
+            samples.append(("_bucket", key + ("+Inf",), state[-1]))
+            samples.append(("_sum", key, state[-2]))
+            samples.append(("_count", key, state[-1]))
+        return samples
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else f"{int(value)}.0"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Any] = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus 文本格式（0.0.4）"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, key, value in metric.samples():
+                labelnames = metric.labelnames + (("le",) if suffix == "_bucket" else ())
+                labels = ",".join(
+                    f'{name}="{_escape(label)}"' for name, label in zip(labelnames, key)
+                )
+                labels = f"{{{labels}}}" if labels else ""
+                lines.append(f"{metric.name}{suffix}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+    def collect(self, reset: bool = False) -> Dict[str, Any]:
+        """所有指标的当前值（可序列化，用于跨进程传递）"""
+        return {name: metric.collect(reset=reset) for name, metric in self.metrics.items()}
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        for name, values in snapshot.items():
+            metric = self.metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+registry = Registry()
+
+stage_seconds = registry.register(Histogram(
+    "pdf_stage_seconds", "处理流程各阶段耗时（秒）", ["stage"]
+))
+paper_entities = registry.register(Histogram(
+    "paper_entities", "每篇论文识别出的实体数", ["kind"], buckets=COUNT_BUCKETS
+))
+crud_seconds = registry.register(Histogram(
+    "crud_call_seconds", "crud 函数耗时（秒）", ["function"]
+))
+db_statements = registry.register(Counter(
+    "db_statements_total", "执行的 SQL 语句数"
+))
+request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时（秒）", ["method", "route", "status"]
+))
+request_statements = registry.register(Histogram(
+    "http_request_db_statements", "每个 HTTP 请求执行的 SQL 语句数", ["route"], buckets=COUNT_BUCKETS
+))
+
+def stage_timer(stage: str):
+    return stage_seconds.time(stage=stage)
+
+def timed(func):
+    """记录 crud 函数（同步或异步）的耗时"""
+    name = func.__name__
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with crud_seconds.time(function=name):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with crud_seconds.time(function=name):
+            return func(*args, **kwargs)
+    return wrapper
+
+# 当前请求的 SQL 语句计数（由请求中间件设置，在线程池和 greenlet 中同样可见）
+_statement_counter: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar(
+    "statement_counter", default=None
+)
+
+try:
+    from greenlet import getcurrent
+except ImportError:
+    getcurrent = None
+
+def _current_counter() -> Optional[List[int]]:
+    counter = _statement_counter.get()
+    if counter is None and getcurrent is not None:
+        # AsyncSession 在新建的 greenlet 中执行语句，新 greenlet 不继承 contextvars，
+        # 从发起调用的父 greenlet（事件循环所在的 greenlet）保存的上下文中读取
+        parent = getcurrent().parent
+        if parent is not None and parent.gr_context is not None:
+            counter = parent.gr_context.get(_statement_counter)
+    return counter
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    db_statements.inc()
+    counter = _current_counter()
+    if counter is not None:
+        counter[0] += 1
+
+def start_statement_count() -> List[int]:
+    counter = [0]
+    _statement_counter.set(counter)
+    return counter
@@ -1,7 +1,244 @@
+import json
+import os
+
+from sqlalchemy import inspect, text
 from sqlalchemy.orm import Session
 from app.db.base_class import Base
 from app.db.session import engine
+from app.models import models  # noqa: F401 确保所有模型已注册到 Base.metadata
+from app.services import document_store, entity_search, fulltext, storage
+
+def _add_missing_columns() -> None:
+    """为已存在的旧表补充模型中新增的列"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                ))
+
+def _backfill_entity_norm() -> None:
+    """为旧数据补充规范化实体名称"""
+    with engine.begin() as conn:
+        rows = conn.execute(text(
+            "SELECT entity_id, entity_name FROM entities WHERE entity_norm IS NULL"
+        )).all()
+        if rows:
+            conn.execute(
+                text("UPDATE entities SET entity_norm = :norm WHERE entity_id = :entity_id"),
+                [
+                    {"entity_id": entity_id, "norm": entity_search.normalize_name(name or "")}
+                    for entity_id, name in rows
+                ]
+            )
+
+def _has_index(table: str, name: str) -> bool:
+    inspector = inspect(engine)
+    return inspector.has_table(table) and \
+        any(index["name"] == name for index in inspector.get_indexes(table))
+
+def _merge_duplicate_entities() -> None:
+    """
+    旧数据库中 (名称, 类型) 重复的实体合并到ID最小的一个，(论文, 实体) 重复的关联行合并计数，
+    否则无法建立唯一索引，而 ingest_paper 的 ON CONFLICT 依赖这些唯一索引
+    """
+    if _has_index("entities", "ux_entities_name_type") and \
+       _has_index("papers_have_entities", "ux_papers_have_entities_paper_entity"):
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TEMP TABLE entity_merge AS "
+            "SELECT e.entity_id AS old_id, k.keep_id FROM entities e JOIN ("
+            "SELECT entity_name, entity_type, MIN(entity_id) AS keep_id FROM entities "
+            "GROUP BY entity_name, entity_type HAVING COUNT(*) > 1"
+            ") k ON e.entity_name = k.entity_name AND e.entity_type = k.entity_type "
+            "WHERE e.entity_id <> k.keep_id"
+        ))
+        try:
+            merged_entities = conn.execute(text("SELECT COUNT(*) FROM entity_merge")).scalar()
+            duplicate_links = conn.execute(text(
+                "SELECT 1 FROM papers_have_entities GROUP BY paper_id, entity_id "
+                "HAVING COUNT(*) > 1 LIMIT 1"
+            )).first()
+            if not merged_entities and duplicate_links is None:
+                return
+            print(f"Merging {merged_entities} duplicate entities")
+            
+            # 关联行与出现位置改指向保留的实体，重复行合并
+            conn.execute(text(
+                "CREATE TEMP TABLE links_merged AS "
+                "SELECT pe.paper_id, COALESCE(m.keep_id, pe.entity_id) AS entity_id, "
+                "SUM(COALESCE(pe.count, 1)) AS count FROM papers_have_entities pe "
+                "LEFT JOIN entity_merge m ON m.old_id = pe.entity_id "
+                "GROUP BY pe.paper_id, COALESCE(m.keep_id, pe.entity_id)"
+            ))
+            conn.execute(text("DELETE FROM papers_have_entities"))
+            conn.execute(text(
+                "INSERT INTO papers_have_entities (paper_id, entity_id, count) "
+                "SELECT paper_id, entity_id, count FROM links_merged"
+            ))
+            conn.execute(text("DROP TABLE links_merged"))
+            
+            if merged_entities:
+                conn.execute(text(
+                    "CREATE TEMP TABLE mentions_merged AS "
+                    "SELECT mt.paper_id, COALESCE(m.keep_id, mt.entity_id) AS entity_id, "
+                    "mt.start_char, MAX(mt.end_char) AS end_char FROM mentions mt "
+                    "LEFT JOIN entity_merge m ON m.old_id = mt.entity_id "
+                    "GROUP BY mt.paper_id, COALESCE(m.keep_id, mt.entity_id), mt.start_char"
+                ))
+                conn.execute(text("DELETE FROM mentions"))
+                conn.execute(text(
+                    "INSERT INTO mentions (paper_id, entity_id, start_char, end_char) "
+                    "SELECT paper_id, entity_id, start_char, end_char FROM mentions_merged"
+                ))
+                conn.execute(text("DROP TABLE mentions_merged"))
+                conn.execute(text(
+                    "DELETE FROM entities WHERE entity_id IN (SELECT old_id FROM entity_merge)"
+                ))
+            # 计数随之变化，由 _backfill_entity_statistics 重新计算
+            conn.execute(text("UPDATE entities SET paper_count = NULL"))
+        finally:
+            conn.execute(text("DROP TABLE entity_merge"))
+
+def _fail_duplicate_active_jobs() -> None:
+    """旧数据库中同名的未结束任务只保留ID最小的一个，其余标记为失败，否则无法建立唯一索引"""
+    if _has_index("ingest_jobs", "ux_ingest_jobs_active_file_name"):
+        return
+    with engine.begin() as conn:
+        result = conn.execute(text(
+            "UPDATE ingest_jobs SET status = 'failed', error = :error "
+            "WHERE status IN ('pending', 'running') AND job_id NOT IN ("
+            "SELECT MIN(job_id) FROM ingest_jobs WHERE status IN ('pending', 'running') "
+            "GROUP BY file_name)"
+        ), {"error": "同名文档的任务已在处理中"})
+        if result.rowcount:
+            print(f"Failed {result.rowcount} duplicate active jobs")
+
+def _backfill_mentions() -> None:
+    """根据旧的实体识别结果JSON文件，为没有位置记录的论文补充 mentions"""
+    with engine.begin() as conn:
+        papers = conn.execute(text(
+            "SELECT paper_id, paper_entities FROM papers WHERE NOT EXISTS "
+            "(SELECT 1 FROM mentions WHERE mentions.paper_id = papers.paper_id)"
+        )).all()
+        for paper_id, ents_path in papers:
+            if not ents_path or not ents_path.endswith(".json") or not os.path.exists(ents_path):
+                continue
+            try:
+                with open(ents_path, "r", encoding="utf-8") as f:
+                    entities = json.load(f)["entities"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error reading {ents_path}: {e}")
+                continue
+            entity_ids = {
+                (name, entity_type): entity_id
+                for entity_id, name, entity_type in conn.execute(text(
+                    "SELECT entities.entity_id, entity_name, entity_type FROM entities "
+                    "JOIN papers_have_entities ON papers_have_entities.entity_id = entities.entity_id "
+                    "WHERE papers_have_entities.paper_id = :paper_id"
+                ), {"paper_id": paper_id})
+            }
+            rows = {}
+            for ent in entities:
+                entity_id = entity_ids.get((ent.get("text"), ent.get("label")))
+                if entity_id is not None and "start_char" in ent:
+                    rows[(entity_id, ent["start_char"])] = {
+                        "paper_id": paper_id,
+                        "entity_id": entity_id,
+                        "start_char": ent["start_char"],
+                        "end_char": ent["end_char"]
+                    }
+            if rows:
+                conn.execute(models.mentions.insert(), list(rows.values()))
+
+def _backfill_entity_statistics() -> None:
+    """旧数据没有实体计数列的值时，由关联表重新计算实体计数及按类型的汇总"""
+    with engine.begin() as conn:
+        missing = conn.execute(text(
+            "SELECT 1 FROM entities WHERE paper_count IS NULL OR total_mentions IS NULL LIMIT 1"
+        )).first()
+        if missing is None:
+            return
+        conn.execute(text(
+            "UPDATE entities SET "
+            "paper_count = (SELECT COUNT(*) FROM papers_have_entities pe "
+            "WHERE pe.entity_id = entities.entity_id), "
+            "total_mentions = (SELECT COALESCE(SUM(pe.count), 0) FROM papers_have_entities pe "
+            "WHERE pe.entity_id = entities.entity_id)"
+        ))
+        conn.execute(text("DELETE FROM entity_type_stats"))
+        conn.execute(text(
+            "INSERT INTO entity_type_stats (entity_type, entity_count, total_mentions) "
+            "SELECT entity_type, COUNT(*), SUM(total_mentions) FROM entities "
+            "WHERE paper_count > 0 GROUP BY entity_type"
+        ))
+
+def _paper_paragraphs(content_hash, paper_json) -> list:
+    """读取论文的段落文本：优先使用缓存的段落文件，旧数据从简化文档中提取"""
+    if content_hash:
+        text_path = storage.artifact_path(content_hash, "text")
+        if os.path.exists(text_path):
+            with open(text_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+    if not paper_json:
+        return []
+    path = document_store.content_path(paper_json)
+    if document_store.exists(path):
+        blocks = document_store.read_blocks(path, 0, document_store.block_count(path))
+    elif os.path.exists(paper_json):
+        with open(paper_json, "r", encoding="utf-8") as f:
+            blocks = document_store.body_blocks(json.load(f))
+    else:
+        return []
+    return [text for text in map(document_store.block_text, blocks) if text.strip()]
+
+def _backfill_fulltext() -> None:
+    """为还没有全文索引的论文（全文索引上线前导入的数据）补建索引"""
+    if not fulltext.is_supported(engine):
+        return
+    span = 1 << fulltext.PARAGRAPH_BITS
+    with Session(bind=engine) as db:
+        papers = db.execute(text(
+            f"SELECT paper_id, content_hash, paper_json FROM papers WHERE NOT EXISTS "
+            f"(SELECT 1 FROM {fulltext.FTS_TABLE} WHERE {fulltext.FTS_TABLE}.rowid "
+            f"BETWEEN papers.paper_id * {span} AND papers.paper_id * {span} + {span - 1})"
+        )).all()
+        for paper_id, content_hash, paper_json in papers:
+            try:
+                paragraphs = _paper_paragraphs(content_hash, paper_json)
+            except (OSError, ValueError) as e:
+                print(f"Error reading text of paper {paper_id}: {e}")
+                continue
+            fulltext.index_paper(db, paper_id, paragraphs)
+        db.commit()
 
 def init_db() -> None:
     # 创建所有表
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    _merge_duplicate_entities()
+    _fail_duplicate_active_jobs()
+    _backfill_entity_norm()
+    _backfill_mentions()
+    _backfill_entity_statistics()
+    
+    # 为已存在的旧表补建新增的索引；唯一索引建不起来时写入会失败，因此直接报错
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                raise RuntimeError(f"创建索引 {index.name} 失败: {e}") from e
+    
+    # 全文索引（仅 SQLite FTS5）与实体名称子串索引
+    fulltext.create_index(engine)
+    entity_search.create_index(engine)
+    _backfill_fulltext() 
\ No newline at end of file
@@ -1,15 +1,54 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
 from app.core.config import settings
 
-# 使用 StaticPool 和 check_same_thread=False 来解决线程问题
-engine = create_engine(
-    settings.SQLALCHEMY_DATABASE_URI,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-    pool_pre_ping=True
-)
+def _is_memory_sqlite(url) -> bool:
+    return url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL 模式下读操作不会被写事务阻塞；写锁冲突时等待而不是立即报错
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def create_db_engine(uri: str = settings.SQLALCHEMY_DATABASE_URI):
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite":
+        if _is_memory_sqlite(url):
+            # 内存数据库只存在于单个连接中，所有线程共享这一个连接
+            return create_engine(
+                uri,
+                connect_args={"check_same_thread": False},
+                poolclass=StaticPool
+            )
+        # 文件数据库：每个线程从连接池取得各自的连接
+        db_engine = create_engine(
+            uri,
+            connect_args={"check_same_thread": False},
+            poolclass=QueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_pre_ping=True
+        )
+        event.listen(db_engine, "connect", _set_sqlite_pragmas)
+        return db_engine
+
+    return create_engine(
+        uri,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True
+    )
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -19,4 +58,76 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+# 异步驱动：API 路由使用异步引擎，命令行工具和后台任务继续使用同步引擎
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg"
+}
+
+def create_async_db_engine(uri: str = settings.SQLALCHEMY_DATABASE_URI):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[backend])
+    if backend == "sqlite":
+        if _is_memory_sqlite(url):
+            return create_async_engine(url, poolclass=StaticPool)
+        db_engine = create_async_engine(
+            url,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_pre_ping=True
+        )
+        event.listen(db_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        return db_engine
+
+    return create_async_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True
+    )
+
+# 异步引擎在第一次使用时创建，只用同步接口的进程不需要安装异步驱动
+_async_engine = None
+_async_sessionmaker = None
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_db_engine()
+    return _async_engine
+
+def AsyncSessionLocal():
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import AsyncSession
+
+        # 提交后不使对象过期，避免在异步上下文中触发隐式加载
+        _async_sessionmaker = sessionmaker(
+            bind=get_async_engine(),
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False
+        )
+    return _async_sessionmaker()
+
+# 异步依赖注入函数
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def dispose_async_engine():
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_sessionmaker = None
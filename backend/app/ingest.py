@@ -0,0 +1,184 @@
+"""
+批量导入PDF论文
+
+用法（在 backend 目录下）：
+    python -m app.ingest papers/ --workers 4
+    python -m app.ingest index.xlsx --source-dir Papers/
+
+文本提取和实体识别在进程池中并行执行，每个工作进程只加载一次 spaCy 模型；
+数据库写入在主进程中串行完成。已完成的文件记录在检查点文件中，
+中断后重新运行会跳过已导入的论文。
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.db.init_db import init_db
+from app.db.session import SessionLocal
+from app.services import crud, storage
+from app.services.nlp import get_nlp, worker_context
+
+def _init_worker() -> None:
+    """工作进程初始化：每个进程只加载一次 spaCy 模型"""
+    get_nlp()
+
+def _analyze(file_path: str, content_hash: str, paper_name: str) -> Dict[str, Any]:
+    from app.services.pdf_processor import analyze_pdf
+    return analyze_pdf(file_path, content_hash=content_hash, paper_name=paper_name)
+
+def collect_from_directory(directory: str) -> List[Dict[str, str]]:
+    """收集目录下的所有PDF文件"""
+    files = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.lower().endswith(".pdf") and os.path.isfile(path):
+            files.append({"paper_pdf": path, "paper_name": os.path.splitext(name)[0]})
+    return files
+
+def collect_from_index(index_path: str, source_dir: str) -> List[Dict[str, str]]:
+    """
+    从索引表格读取待导入文件（与 prototype.py 的 index.xlsx 格式一致）
+    表头需包含 paper_pdf（相对 source_dir 的文件名），可选 paper_name
+    """
+    try:
+        import openpyxl
+    except ImportError:
+        raise SystemExit("读取 .xlsx 索引需要安装 openpyxl")
+
+    workbook = openpyxl.load_workbook(index_path, read_only=True, data_only=True)
+    sheet = workbook[workbook.sheetnames[0]]
+    rows = sheet.iter_rows(values_only=True)
+    headers = [str(cell).strip() if cell is not None else "" for cell in next(rows)]
+    if "paper_pdf" not in headers:
+        raise SystemExit("索引表格缺少 paper_pdf 列")
+
+    files = []
+    for row in rows:
+        record = dict(zip(headers, row))
+        if not record.get("paper_pdf"):
+            continue
+        pdf_name = str(record["paper_pdf"]).strip()
+        files.append({
+            "paper_pdf": os.path.join(source_dir, pdf_name),
+            "paper_name": str(record.get("paper_name") or os.path.splitext(pdf_name)[0]).strip()
+        })
+    return files
+
+def load_checkpoint(checkpoint_path: str) -> Set[str]:
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+def ingest(
+    files: List[Dict[str, str]],
+    workers: int,
+    checkpoint_path: str,
+    report_every: int = 10
+) -> Dict[str, Any]:
+    """并行处理文件并写入数据库，返回导入统计"""
+    done_paths = load_checkpoint(checkpoint_path)
+    os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+    checkpoint = open(checkpoint_path, "a", encoding="utf-8")
+    db = SessionLocal()
+    stats = {"total": len(files), "ingested": 0, "skipped": 0, "failed": 0}
+    failed: List[str] = []
+
+    def mark_done(path: str) -> None:
+        checkpoint.write(path + "\n")
+        checkpoint.flush()
+
+    # 在主进程中跳过检查点中已完成、以及内容或名称已入库的论文
+    pending = []
+    seen_hashes = set()
+    for item in files:
+        path = item["paper_pdf"]
+        if path in done_paths:
+            stats["skipped"] += 1
+            continue
+        if not os.path.isfile(path):
+            print(f"File not found: {path}")
+            stats["failed"] += 1
+            failed.append(path)
+            continue
+        content_hash = storage.hash_file(path)
+        if content_hash in seen_hashes or \
+           crud.get_paper_by_hash(db, content_hash) is not None or \
+           crud.get_paper_by_name(db, item["paper_name"]) is not None:
+            stats["skipped"] += 1
+            mark_done(path)
+            continue
+        seen_hashes.add(content_hash)
+        pending.append((path, content_hash, item["paper_name"]))
+
+    print(f"{len(pending)} papers to ingest, {stats['skipped']} skipped")
+    started = time.perf_counter()
+    processed = 0
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=worker_context(),
+            initializer=_init_worker
+        ) as executor:
+            futures = {
+                executor.submit(_analyze, path, content_hash, paper_name): path
+                for path, content_hash, paper_name in pending
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    result = future.result()
+                    crud.ingest_paper(db, result["paper"], result["entities"], result["paragraphs"])
+                    stats["ingested"] += 1
+                    mark_done(path)
+                except Exception as e:
+                    print(f"Error ingesting {path}: {e}")
+                    stats["failed"] += 1
+                    failed.append(path)
+
+                processed += 1
+                if processed % report_every == 0:
+                    elapsed = time.perf_counter() - started
+                    print(f"{processed}/{len(pending)} papers, "
+                          f"{stats['ingested'] / elapsed * 60:.1f} papers/min")
+    finally:
+        checkpoint.close()
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    stats["elapsed_seconds"] = round(elapsed, 2)
+    stats["papers_per_minute"] = round(stats["ingested"] / elapsed * 60, 2) if elapsed > 0 else 0.0
+    stats["failed_files"] = failed
+    return stats
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="批量导入PDF论文")
+    parser.add_argument("source", help="PDF目录，或 .xlsx 索引文件")
+    parser.add_argument("--source-dir", default="papers", help="索引中 paper_pdf 所在的目录")
+    parser.add_argument("--workers", type=int, default=settings.INGEST_WORKERS, help="工作进程数")
+    parser.add_argument(
+        "--checkpoint",
+        default=os.path.join("data", "ingest_checkpoint.txt"),
+        help="检查点文件，记录已完成的文件以便断点续传"
+    )
+    parser.add_argument("--report-every", type=int, default=10, help="每处理多少篇输出一次吞吐量")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.source):
+        files = collect_from_directory(args.source)
+    else:
+        files = collect_from_index(args.source, args.source_dir)
+
+    os.makedirs("data", exist_ok=True)  # 数据库目录
+    init_db()
+    stats = ingest(files, args.workers, args.checkpoint, args.report_every)
+    print(f"Ingested {stats['ingested']}, skipped {stats['skipped']}, failed {stats['failed']} "
+          f"in {stats['elapsed_seconds']}s ({stats['papers_per_minute']} papers/min)")
+    for path in stats["failed_files"]:
+        print(f"Failed: {path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,15 @@
+import cProfile
 import os
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router as api_router
+from app.core import metrics
 from app.core.config import settings
 from app.db.init_db import init_db
-
-# 初始化数据库
-init_db()
+from app.db.session import dispose_async_engine
+from app.services import jobs, page_parallel
 
 # 创建必要的目录
 os.makedirs("data", exist_ok=True)  # 数据库目录
@@ -14,6 +17,10 @@ os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 os.makedirs(settings.DOCS_DIR, exist_ok=True)
 os.makedirs(settings.JSON_DIR, exist_ok=True)
 os.makedirs(settings.ENTS_DIR, exist_ok=True)
+os.makedirs(settings.STORE_DIR, exist_ok=True)
+
+# 初始化数据库
+init_db()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -30,9 +37,86 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 上传请求在读取请求体之前检查长度：Starlette 解析表单时会先把整个文件缓存到临时文件，
+# 因此要求声明 Content-Length（服务器保证实际请求体不超过声明的长度），超过上限直接拒绝
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    if request.method == "POST" and request.url.path.endswith("/papers/upload/"):
+        content_length = request.headers.get("content-length")
+        if not content_length or not content_length.isdigit():
+            return JSONResponse(status_code=411, content={"detail": "上传请求需要声明 Content-Length"})
+        if int(content_length) > settings.MAX_UPLOAD_SIZE + settings.UPLOAD_CHUNK_SIZE:
+            # 预留一个分块大小给 multipart 的边界和表单头
+            return JSONResponse(status_code=413, content={"detail": "文件超过大小上限"})
+    return await call_next(request)
+
+# 处理函数 -> 路由模板，首次请求时建立（此时所有路由均已注册）
+_route_paths = {}
+
+def _route_path(request: Request) -> str:
+    """
+    请求匹配到的路由模板（如 /api/v1/papers/{paper_id}），避免按实际路径产生过多标签
+    当前版本的 Starlette 路由匹配后只在 scope 中写入 endpoint，没有 scope["route"]，因此按处理函数查表
+    """
+    if not _route_paths:
+        _route_paths.update(
+            (route.endpoint, route.path) for route in request.app.routes if hasattr(route, "endpoint")
+        )
+    return _route_paths.get(request.scope.get("endpoint"), "unmatched")
+
+# 记录请求耗时和执行的SQL语句数；开启 ENABLE_PROFILING 时支持按请求做 cProfile 分析
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    counter = metrics.start_statement_count()
+    profiler = None
+    if settings.ENABLE_PROFILING and request.headers.get("x-profile") == "1":
+        # 只能分析事件循环线程，线程池中执行的同步处理函数不在结果中
+        profiler = cProfile.Profile()
+        profiler.enable()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        path = _route_path(request)
+        metrics.request_seconds.observe(elapsed, method=request.method, route=path, status=str(status))
+        metrics.request_statements.observe(counter[0], route=path)
+        if profiler is not None:
+            profiler.disable()
+    if profiler is not None:
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        profile_path = os.path.join(settings.PROFILE_DIR, f"{time.time_ns()}.prof")
+        profiler.dump_stats(profile_path)
+        response.headers["X-Profile-Path"] = profile_path
+    if settings.ENABLE_PROFILING:
+        response.headers["X-DB-Statements"] = str(counter[0])
+    return response
+
 # 包含API路由
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.on_event("startup")
+def resume_ingest_jobs():
+    # 重新提交上次未完成的处理任务，并定期检查失去心跳的任务
+    jobs.resume_jobs()
+    jobs.start_watchdog()
+
+@app.on_event("shutdown")
+def shutdown_ingest_workers():
+    jobs.shutdown()
+    page_parallel.shutdown()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus 格式的指标"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": "欢迎使用PDF文档实体识别与关系可视化平台API"} 
\ No newline at end of file
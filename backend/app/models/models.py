@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Table
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, ForeignKey, Table, DateTime, Index, PrimaryKeyConstraint, text
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 
@@ -8,7 +9,24 @@ papers_entities = Table(
     Base.metadata,
     Column('paper_id', Integer, ForeignKey('papers.paper_id')),
     Column('entity_id', Integer, ForeignKey('entities.entity_id')),
-    Column('count', Integer, default=1)
+    Column('count', Integer, default=1),
+    # 每个(论文, 实体)对只保留一行计数
+    Index('ux_papers_have_entities_paper_entity', 'paper_id', 'entity_id', unique=True),
+    Index('ix_papers_have_entities_entity_id', 'entity_id')
+)
+
+# 实体在论文全文中的每次出现位置（字符偏移，左闭右开）
+mentions = Table(
+    'mentions',
+    Base.metadata,
+    Column('paper_id', Integer, ForeignKey('papers.paper_id'), nullable=False),
+    Column('entity_id', Integer, ForeignKey('entities.entity_id'), nullable=False),
+    Column('start_char', Integer, nullable=False),
+    Column('end_char', Integer, nullable=False),
+    # 某实体在某论文中的出现按位置有序：(论文, 实体) 前缀查找
+    PrimaryKeyConstraint('paper_id', 'entity_id', 'start_char'),
+    # 按位置浏览一篇论文中的所有实体
+    Index('ix_mentions_paper_start', 'paper_id', 'start_char')
 )
 
 class Paper(Base):
@@ -20,6 +38,8 @@ class Paper(Base):
     paper_docx = Column(String)
     paper_json = Column(String)
     paper_entities = Column(String)
+    # PDF内容的 SHA-256，用于识别重复上传
+    content_hash = Column(String, unique=True, index=True, nullable=True)
     
     # 与Entity的多对多关系
     entities = relationship(
@@ -34,10 +54,76 @@ class Entity(Base):
     entity_id = Column(Integer, primary_key=True, index=True)
     entity_name = Column(String)
     entity_type = Column(String)
+    # 规范化名称（折叠空白、casefold），用于不区分大小写的索引检索
+    entity_norm = Column(String)
+    # 关联论文数与在所有论文中的出现次数，导入/删除论文时在同一事务中增量维护
+    paper_count = Column(Integer, default=0)
+    total_mentions = Column(Integer, default=0)
+    
+    __table_args__ = (
+        # 与 prototype.py 一致：(名称, 类型) 唯一，供 ON CONFLICT 批量写入使用
+        Index('ux_entities_name_type', 'entity_name', 'entity_type', unique=True),
+        # 前缀检索：不限类型 / 限定类型
+        Index('ix_entities_norm', 'entity_norm'),
+        Index('ix_entities_type_norm', 'entity_type', 'entity_norm'),
+        # 按关联论文数取最常见的实体
+        Index('ix_entities_paper_count', 'paper_count'),
+    )
     
     # 与Paper的多对多关系
     papers = relationship(
         "Paper",
         secondary=papers_entities,
         back_populates="entities"
-    ) 
\ No newline at end of file
+    ) 
+
+class EntityTypeStat(Base):
+    """按实体类型汇总的计数，只统计至少关联一篇论文的实体，与 Entity 的计数列一同维护"""
+    __tablename__ = "entity_type_stats"
+
+    entity_type = Column(String, primary_key=True)
+    entity_count = Column(Integer, default=0)
+    total_mentions = Column(Integer, default=0)
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+    __table_args__ = (
+        # 同名文件同时只能有一个未结束的任务，并发上传同名文件时由数据库拒绝后来者
+        Index(
+            'ux_ingest_jobs_active_file_name', 'file_name', unique=True,
+            sqlite_where=text("status IN ('pending', 'running')"),
+            postgresql_where=text("status IN ('pending', 'running')")
+        ),
+    )
+
+    job_id = Column(Integer, primary_key=True, index=True)
+    file_name = Column(String)
+    file_path = Column(String)
+    content_hash = Column(String, index=True, nullable=True)
+    # pending / running / done / failed
+    status = Column(String, default="pending", index=True)
+    stage = Column(String, default="queued")
+    progress = Column(Integer, default=0)
+    paper_id = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class CorpusEvent(Base):
+    """论文增删事件日志，供内存索引（如知识图谱）增量同步"""
+    __tablename__ = "corpus_events"
+
+    event_id = Column(Integer, primary_key=True, index=True)
+    paper_id = Column(Integer, index=True)
+    # add / remove
+    action = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class CorpusState(Base):
+    """语料版本计数器（只有一行）：与事件在同一事务中按事件数递增，读缓存时只读这一行"""
+    __tablename__ = "corpus_state"
+
+    state_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
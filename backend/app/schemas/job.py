@@ -0,0 +1,17 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+class Job(BaseModel):
+    job_id: int
+    file_name: str
+    status: str
+    stage: Optional[str] = None
+    progress: int = 0
+    paper_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        orm_mode = True
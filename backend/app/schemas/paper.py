@@ -13,6 +13,19 @@ class PaperCreate(PaperBase):
 
 class Paper(PaperBase):
     paper_id: int
+    content_hash: Optional[str] = None
     
     class Config:
-        orm_mode = True 
\ No newline at end of file
+        orm_mode = True
+
+class PaperBulkDelete(BaseModel):
+    """批量删除条件，多个条件同时给出时取交集"""
+    paper_ids: Optional[List[int]] = None
+    # 论文名称前缀
+    name_prefix: Optional[str] = None
+    # 论文查询语句，同 /papers/search/
+    query: Optional[str] = None
+
+class PaperBulkDeleteResult(BaseModel):
+    deleted: int
+    paper_ids: List[int]
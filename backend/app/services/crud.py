@@ -1,10 +1,18 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional, Dict, Any
-from app.models.models import Paper, Entity, papers_entities
+from sqlalchemy import bindparam, exists, func
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+from collections import Counter
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from app.core import metrics
+from app.core.config import settings
+from app.models.models import Paper, Entity, EntityTypeStat, IngestJob, CorpusEvent, CorpusState, mentions, papers_entities
 from app.schemas.paper import PaperCreate
 from app.schemas.entity import EntityCreate
+from app.services import document_store, entity_search, fulltext, storage
 import os
+import shutil
 
 def get_paper(db: Session, paper_id: int) -> Optional[Paper]:
     return db.query(Paper).filter(Paper.paper_id == paper_id).first()
@@ -12,6 +20,12 @@ def get_paper(db: Session, paper_id: int) -> Optional[Paper]:
 def get_papers(db: Session, skip: int = 0, limit: int = 100) -> List[Paper]:
     return db.query(Paper).offset(skip).limit(limit).all()
 
+def get_paper_by_name(db: Session, paper_name: str) -> Optional[Paper]:
+    return db.query(Paper).filter(Paper.paper_name == paper_name).first()
+
+def get_paper_by_hash(db: Session, content_hash: str) -> Optional[Paper]:
+    return db.query(Paper).filter(Paper.content_hash == content_hash).first()
+
 def create_paper(db: Session, paper: Dict[str, Any]) -> Paper:
     db_paper = Paper(
         paper_name=paper["paper_name"],
@@ -28,209 +42,468 @@ def create_paper(db: Session, paper: Dict[str, Any]) -> Paper:
 def get_entity(db: Session, entity_id: int) -> Optional[Entity]:
     return db.query(Entity).filter(Entity.entity_id == entity_id).first()
 
-def get_entities(db: Session, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
-    """获取实体列表，包含每个实体关联的论文信息"""
-    entities = db.query(Entity).offset(skip).limit(limit).all()
+# 单条 IN 查询的参数个数上限（SQLite 默认限制为 999）
+_IN_CHUNK_SIZE = 500
+
+# ingest_paper 遇到并发删除实体导致的外键冲突时的重试次数
+_INGEST_RETRIES = 3
+
+def _upsert_insert(db: Session, table):
+    """按数据库方言返回支持 ON CONFLICT 的 insert 语句"""
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+@metrics.timed
+def bulk_get_or_create_entities(
+    db: Session,
+    keys: Iterable[Tuple[str, str]]
+) -> Dict[Tuple[str, str], int]:
+    """
+    批量创建实体并返回 (名称, 类型) -> entity_id 的映射
+    使用一次 INSERT ... ON CONFLICT DO NOTHING 写入，再按名称分块回查ID，不提交事务
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
     
-    result = []
-    for entity in entities:
-        # 获取与该实体关联的所有论文
-        papers = db.query(Paper).join(papers_entities).filter(
-            papers_entities.c.entity_id == entity.entity_id
-        ).all()
+    entity_ids = {}
+    pending = keys
+    while pending:
+        stmt = _upsert_insert(db, Entity.__table__).on_conflict_do_nothing(
+            index_elements=["entity_name", "entity_type"]
+        )
+        db.execute(stmt, [
+            {
+                "entity_name": name,
+                "entity_type": entity_type,
+                "entity_norm": entity_search.normalize_name(name)
+            }
+            for name, entity_type in pending
+        ])
         
-        # 构建实体信息
-        entity_info = {
-            "entity_id": entity.entity_id,
-            "entity_name": entity.entity_name,
-            "entity_type": entity.entity_type,
-            "papers": [
-                {
-                    "paper_id": paper.paper_id,
-                    "paper_name": paper.paper_name,
-                    # 获取该实体在这篇论文中出现的次数
-                    "count": db.query(papers_entities.c.count).filter(
-                        papers_entities.c.paper_id == paper.paper_id,
-                        papers_entities.c.entity_id == entity.entity_id
-                    ).scalar() or 0
-                }
-                for paper in papers
-            ]
-        }
-        result.append(entity_info)
-    
-    return result
-
-def create_entity(db: Session, entity: Dict[str, Any]) -> Entity:
-    # 检查实体是否已存在
-    existing_entity = db.query(Entity).filter(
-        Entity.entity_name == entity["entity_name"],
-        Entity.entity_type == entity["entity_type"]
-    ).first()
-    
-    if existing_entity:
-        return existing_entity
-    
-    db_entity = Entity(
-        entity_name=entity["entity_name"],
-        entity_type=entity["entity_type"]
+        wanted = set(pending)
+        names = sorted({name for name, _ in pending})
+        for i in range(0, len(names), _IN_CHUNK_SIZE):
+            rows = db.query(
+                Entity.entity_id, Entity.entity_name, Entity.entity_type
+            ).filter(Entity.entity_name.in_(names[i:i + _IN_CHUNK_SIZE])).all()
+            for entity_id, name, entity_type in rows:
+                if (name, entity_type) in wanted:
+                    entity_ids[(name, entity_type)] = entity_id
+        # 插入时冲突的已有实体可能在回查前被并发的 delete_papers 删除，重新插入缺少的
+        pending = [key for key in pending if key not in entity_ids]
+    return entity_ids
+
+def update_entity_statistics(db: Session, deltas: Dict[int, Tuple[int, int]]) -> None:
+    """
+    增量更新实体的关联论文数、出现次数及按类型的汇总，不提交事务
+    deltas 为 entity_id -> (关联论文数变化, 出现次数变化)；
+    关联论文数在 0 与非 0 之间变化的实体计入/移出所属类型的实体数
+    """
+    deltas = {entity_id: delta for entity_id, delta in deltas.items() if delta != (0, 0)}
+    if not deltas:
+        return
+    # 先更新（在 PostgreSQL 中锁定这些行），再读回新值推算原值
+    db.execute(
+        Entity.__table__.update().where(Entity.entity_id == bindparam("target_id")).values(
+            paper_count=Entity.paper_count + bindparam("paper_delta"),
+            total_mentions=Entity.total_mentions + bindparam("mention_delta")
+        ),
+        [
+            {"target_id": entity_id, "paper_delta": paper_delta, "mention_delta": mention_delta}
+            for entity_id, (paper_delta, mention_delta) in deltas.items()
+        ]
     )
-    db.add(db_entity)
-    db.commit()
-    db.refresh(db_entity)
-    return db_entity
-
-def add_paper_entity(db: Session, paper_id: int, entity_id: int, count: int = 1) -> None:
-    # 检查关系是否已存在
-    existing = db.query(papers_entities).filter_by(
-        paper_id=paper_id,
-        entity_id=entity_id
-    ).first()
     
-    if existing:
-        # 更新计数
-        stmt = papers_entities.update().where(
-            papers_entities.c.paper_id == paper_id,
-            papers_entities.c.entity_id == entity_id
-        ).values(count=count)
-        db.execute(stmt)
-    else:
-        # 创建新关系
-        stmt = papers_entities.insert().values(
-            paper_id=paper_id,
-            entity_id=entity_id,
-            count=count
-        )
-        db.execute(stmt)
+    type_deltas: Dict[str, List[int]] = {}
+    entity_ids = list(deltas)
+    for i in range(0, len(entity_ids), _IN_CHUNK_SIZE):
+        rows = db.query(Entity.entity_id, Entity.entity_type, Entity.paper_count).filter(
+            Entity.entity_id.in_(entity_ids[i:i + _IN_CHUNK_SIZE])
+        ).all()
+        for entity_id, entity_type, paper_count in rows:
+            paper_delta, mention_delta = deltas[entity_id]
+            previous = paper_count - paper_delta
+            totals = type_deltas.setdefault(entity_type, [0, 0])
+            totals[0] += (paper_count > 0) - (previous > 0)
+            totals[1] += mention_delta
     
-    db.commit()
+    stmt = _upsert_insert(db, EntityTypeStat.__table__)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["entity_type"],
+            set_={
+                "entity_count": EntityTypeStat.entity_count + stmt.excluded.entity_count,
+                "total_mentions": EntityTypeStat.total_mentions + stmt.excluded.total_mentions
+            }
+        ),
+        [
+            {"entity_type": entity_type, "entity_count": count, "total_mentions": total}
+            for entity_type, (count, total) in type_deltas.items()
+        ]
+    )
 
-def search_entities(
+def _is_foreign_key_violation(error: IntegrityError) -> bool:
+    """PostgreSQL 的外键约束冲突（SQLSTATE 23503）"""
+    return getattr(error.orig, "pgcode", None) == "23503"
+
+def _write_paper(
     db: Session,
-    query: str,
-    entity_type: Optional[str] = None
-) -> List[Entity]:
-    search = db.query(Entity)
-    if entity_type:
-        search = search.filter(Entity.entity_type == entity_type)
-    return search.filter(Entity.entity_name.ilike(f"%{query}%")).all()
-
-def get_entity_statistics(db: Session) -> Dict[str, Any]:
-    # 获取实体类型统计
-    type_stats = db.query(
-        Entity.entity_type,
-        func.count(Entity.entity_id).label('count')
-    ).group_by(Entity.entity_type).all()
+    paper: Dict[str, Any],
+    entities: List[Dict[str, Any]],
+    entity_counts: Counter,
+    paragraphs: Optional[List[str]]
+) -> Paper:
+    """ingest_paper 的写入部分，不提交事务"""
+    db_paper = Paper(
+        paper_name=paper["paper_name"],
+        paper_pdf=paper["paper_pdf"],
+        paper_docx=paper["paper_docx"],
+        paper_json=paper["paper_json"],
+        paper_entities=paper["paper_entities"],
+        content_hash=paper.get("content_hash")
+    )
+    db.add(db_paper)
+    db.flush()
     
-    # 获取最常见的实体
-    common_entities = db.query(
+    entity_ids = bulk_get_or_create_entities(db, entity_counts.keys())
+    if entity_counts:
+        db.execute(papers_entities.insert(), [
+            {
+                "paper_id": db_paper.paper_id,
+                "entity_id": entity_ids[key],
+                "count": count
+            }
+            for key, count in entity_counts.items()
+        ])
+        update_entity_statistics(db, {
+            entity_ids[key]: (1, count) for key, count in entity_counts.items()
+        })
+    # 实体每次出现的位置，(实体, 起始偏移) 相同的只保留一条
+    mention_rows = {
+        (entity_ids[(ent["text"], ent["label"])], ent["start_char"]): ent["end_char"]
+        for ent in entities if "start_char" in ent
+    }
+    if mention_rows:
+        db.execute(mentions.insert(), [
+            {
+                "paper_id": db_paper.paper_id,
+                "entity_id": entity_id,
+                "start_char": start_char,
+                "end_char": end_char
+            }
+            for (entity_id, start_char), end_char in mention_rows.items()
+        ])
+    fulltext.index_paper(db, db_paper.paper_id, paragraphs or [])
+    # 版本计数器的行锁持有到提交，放在事务最后
+    record_corpus_events(db, [db_paper.paper_id], "add")
+    return db_paper
+
+@metrics.timed
+def ingest_paper(
+    db: Session,
+    paper: Dict[str, Any],
+    entities: List[Dict[str, Any]],
+    paragraphs: Optional[List[str]] = None
+) -> Paper:
+    """
+    在单个事务中写入论文、实体、论文-实体关系、实体出现位置及全文索引
+    entities 为识别结果列表（含 text 和 label，以及可选的 start_char/end_char），
+    相同实体在内存中去重计数；
+    paragraphs 为论文段落文本，写入全文索引；
+    相同内容（content_hash）的论文已由并发的任务写入时，返回已有的论文
+    """
+    entity_counts = Counter((ent["text"], ent["label"]) for ent in entities)
+    metrics.paper_entities.observe(len(entities), kind="mentions")
+    metrics.paper_entities.observe(len(entity_counts), kind="unique")
+    # PostgreSQL 读已提交级别下，ON CONFLICT DO NOTHING 之后回查到的已有实体
+    # 可能在写入关联行之前被并发的 delete_papers 作为孤立实体删除，此时外键冲突，整体重试即可
+    for attempt in range(_INGEST_RETRIES + 1):
+        try:
+            db_paper = _write_paper(db, paper, entities, entity_counts, paragraphs)
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            if _is_foreign_key_violation(e) and attempt < _INGEST_RETRIES:
+                print(f"Retrying ingest of {paper['paper_name']}: {e.orig}")
+                continue
+            existing = get_paper_by_hash(db, paper["content_hash"]) if paper.get("content_hash") else None
+            if existing is None:
+                raise
+            return existing
+        except Exception:
+            db.rollback()
+            raise
+        
+        db.refresh(db_paper)
+        return db_paper
+
+def record_corpus_events(db: Session, paper_ids: List[int], action: str) -> None:
+    """
+    记录论文增删事件并把语料版本号加上事件数，随调用方的事务一起提交
+    先更新版本计数器：这一行的锁持有到提交，之后才分配事件ID，
+    因此 PostgreSQL 上事件ID的提交顺序也与ID顺序一致，按 ID 增量同步不会漏掉事件
+    """
+    stmt = _upsert_insert(db, CorpusState.__table__)
+    db.execute(
+        stmt.values(state_id=1, version=len(paper_ids)).on_conflict_do_update(
+            index_elements=["state_id"],
+            set_={"version": CorpusState.version + stmt.excluded.version}
+        )
+    )
+    db.execute(CorpusEvent.__table__.insert(), [
+        {"paper_id": paper_id, "action": action} for paper_id in paper_ids
+    ])
+
+def get_corpus_version(db: Session) -> int:
+    """当前语料版本号（只读计数器所在的一行）"""
+    return db.query(CorpusState.version).filter(CorpusState.state_id == 1).scalar() or 0
+
+def get_corpus_state(db: Session) -> Tuple[int, int]:
+    """(语料版本号, 最后一个事件ID)，在同一条语句中读取以保证一致"""
+    version = db.query(CorpusState.version).filter(CorpusState.state_id == 1).scalar_subquery()
+    last_event_id = db.query(func.max(CorpusEvent.event_id)).scalar_subquery()
+    version, last_event_id = db.query(version, last_event_id).one()
+    return version or 0, last_event_id or 0
+
+@metrics.timed
+def get_corpus_events(db: Session, after_id: int) -> List[CorpusEvent]:
+    """ID大于 after_id 的事件"""
+    return db.query(CorpusEvent).filter(
+        CorpusEvent.event_id > after_id
+    ).order_by(CorpusEvent.event_id).all()
+
+@metrics.timed
+def get_paper_edges(db: Session, paper_id: Optional[int] = None) -> List[Tuple[int, int, str, str, int]]:
+    """
+    获取论文-实体边 (paper_id, entity_id, entity_name, entity_type, count)
+    paper_id 为空时返回全部边
+    """
+    query = db.query(
+        papers_entities.c.paper_id,
+        Entity.entity_id,
         Entity.entity_name,
         Entity.entity_type,
-        func.count(papers_entities.c.paper_id).label('paper_count')
-    ).join(papers_entities).group_by(
-        Entity.entity_id
-    ).order_by(
-        func.count(papers_entities.c.paper_id).desc()
-    ).limit(10).all()
-    
+        papers_entities.c.count
+    ).join(Entity, Entity.entity_id == papers_entities.c.entity_id)
+    if paper_id is not None:
+        query = query.filter(papers_entities.c.paper_id == paper_id)
+    return query.all()
+
+def format_entity_statistics(type_stats, common_entities) -> Dict[str, Any]:
     return {
         "type_statistics": [
-            {"type": t[0], "count": t[1]} for t in type_stats
+            {"type": t[0], "count": t[1], "total_mentions": t[2]} for t in type_stats
         ],
         "common_entities": [
             {
                 "name": e[0],
                 "type": e[1],
-                "paper_count": e[2]
+                "paper_count": e[2],
+                "total_mentions": e[3]
             } for e in common_entities
         ]
     }
 
-def delete_paper(db: Session, paper_id: int) -> bool:
-    """删除论文及其相关文件和关系"""
+@metrics.timed
+def get_entity_statistics(db: Session, limit: int = 10) -> Dict[str, Any]:
+    """读取增量维护的统计表：各类型实体数，以及关联论文最多的实体（paper_count 索引）"""
+    type_stats = db.query(
+        EntityTypeStat.entity_type,
+        EntityTypeStat.entity_count,
+        EntityTypeStat.total_mentions
+    ).filter(EntityTypeStat.entity_count > 0).order_by(EntityTypeStat.entity_type).all()
+    
+    common_entities = db.query(
+        Entity.entity_name,
+        Entity.entity_type,
+        Entity.paper_count,
+        Entity.total_mentions
+    ).filter(Entity.paper_count > 0).order_by(Entity.paper_count.desc()).limit(limit).all()
+    
+    return format_entity_statistics(type_stats, common_entities)
+
+# 删除论文文件的后台线程池（首次批量删除时创建）
+_file_executor: Optional[ThreadPoolExecutor] = None
+
+def remove_paper_files(paper: Any) -> None:
+    """删除论文的PDF/DOCX/JSON/实体文件及内容寻址目录中的缓存，paper 可以是 Paper 或同名字段的行"""
+    files_to_delete = [
+        paper.paper_pdf,
+        paper.paper_docx,
+        paper.paper_json,
+        paper.paper_entities
+    ]
+    if paper.paper_json:
+        # 分段存储的简化文档及其偏移索引
+        content_path = document_store.content_path(paper.paper_json)
+        files_to_delete += [content_path, document_store.index_path(content_path)]
+    
+    for file_path in files_to_delete:
+        if file_path and os.path.exists(file_path):
+            try:
+                os.remove(file_path)
+                print(f"Deleted file: {file_path}")
+            except OSError as e:
+                print(f"Error deleting file {file_path}: {e}")
+                # 继续执行，不中断删除过程
+    
+    # 删除内容寻址目录中的其余缓存（段落文本等）
+    if paper.content_hash:
+        shutil.rmtree(storage.artifact_dir(paper.content_hash), ignore_errors=True)
+
+def remove_paper_files_in_background(papers: Iterable[Any]) -> None:
+    """在后台线程池中删除论文文件，不等待完成"""
+    global _file_executor
+    if _file_executor is None:
+        _file_executor = ThreadPoolExecutor(
+            max_workers=settings.FILE_DELETE_WORKERS,
+            thread_name_prefix="remove-files"
+        )
+    for paper in papers:
+        _file_executor.submit(remove_paper_files, paper)
+
+def _chunks(values: List[int]) -> Iterable[List[int]]:
+    for i in range(0, len(values), _IN_CHUNK_SIZE):
+        yield values[i:i + _IN_CHUNK_SIZE]
+
+@metrics.timed
+def delete_papers(db: Session, paper_ids: Iterable[int]) -> List[Any]:
+    """
+    在单个事务中批量删除论文：关联关系、出现位置、全文索引、论文记录、
+    删除事件、实体计数，以及因此不再关联任何论文的实体，全部按ID分块用集合语句完成
+    返回已删除论文的文件信息（含 paper_id 及各文件路径），文件由调用方删除
+    """
+    paper_ids = sorted(set(paper_ids))
     try:
-        # 获取论文信息（用于删除文件）
-        paper = db.query(Paper).filter(Paper.paper_id == paper_id).first()
-        if not paper:
-            print(f"Paper with id {paper_id} not found")
-            return False
-
-        # 删除论文-实体关联关系
-        result = db.query(papers_entities).filter(
-            papers_entities.c.paper_id == paper_id
-        ).delete(synchronize_session=False)
-        print(f"Deleted {result} paper-entity relationships")
-
-        # 删除相关文件
-        files_to_delete = [
-            paper.paper_pdf,
-            paper.paper_docx,
-            paper.paper_json,
-            paper.paper_entities
-        ]
+        removed = []
+        for chunk in _chunks(paper_ids):
+            removed += db.query(
+                Paper.paper_id,
+                Paper.paper_pdf,
+                Paper.paper_docx,
+                Paper.paper_json,
+                Paper.paper_entities,
+                Paper.content_hash
+            ).filter(Paper.paper_id.in_(chunk)).all()
+        if not removed:
+            return []
+        paper_ids = [paper.paper_id for paper in removed]
         
-        for file_path in files_to_delete:
-            if file_path and os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                    print(f"Deleted file: {file_path}")
-                except OSError as e:
-                    print(f"Error deleting file {file_path}: {e}")
-                    # 继续执行，不中断删除过程
-
-        # 删除论文记录
-        db.delete(paper)
-        db.commit()
-        print(f"Successfully deleted paper {paper_id}")
-        return True
+        # 按实体汇总要扣减的关联论文数和出现次数
+        deltas: Dict[int, Tuple[int, int]] = {}
+        for chunk in _chunks(paper_ids):
+            rows = db.query(
+                papers_entities.c.entity_id,
+                func.count(),
+                func.coalesce(func.sum(papers_entities.c.count), 0)
+            ).filter(
+                papers_entities.c.paper_id.in_(chunk)
+            ).group_by(papers_entities.c.entity_id)
+            for entity_id, paper_count, total in rows:
+                paper_delta, mention_delta = deltas.get(entity_id, (0, 0))
+                deltas[entity_id] = (paper_delta - paper_count, mention_delta - total)
+        update_entity_statistics(db, deltas)
+        
+        for chunk in _chunks(paper_ids):
+            db.execute(papers_entities.delete().where(papers_entities.c.paper_id.in_(chunk)))
+            db.execute(mentions.delete().where(mentions.c.paper_id.in_(chunk)))
+            db.execute(Paper.__table__.delete().where(Paper.paper_id.in_(chunk)))
+        fulltext.remove_papers(db, paper_ids)
         
+        # 只检查受影响的实体，借助关联表的 entity_id 索引判断是否还有关联论文
+        entity_table = Entity.__table__
+        orphaned = ~exists().where(papers_entities.c.entity_id == entity_table.c.entity_id)
+        for chunk in _chunks(list(deltas)):
+            # 并发的 ingest_paper 可能刚为其中的实体写入关联（本语句的快照中不可见），
+            # 此时外键冲突，只回滚到保存点并保留这一块实体，剩下的孤立实体由 cleanup_unused_entities 清理
+            savepoint = db.begin_nested()
+            try:
+                db.execute(entity_table.delete().where(entity_table.c.entity_id.in_(chunk), orphaned))
+                savepoint.commit()
+            except IntegrityError as e:
+                savepoint.rollback()
+                if not _is_foreign_key_violation(e):
+                    raise
+        record_corpus_events(db, paper_ids, "remove")
+        db.commit()
     except Exception as e:
         db.rollback()
-        print(f"Error deleting paper {paper_id}: {e}")
+        print(f"Error deleting papers: {e}")
         raise Exception(f"删除文档失败: {str(e)}")
     
-    return False
+    print(f"Deleted {len(removed)} papers")
+    return removed
 
-def cleanup_unused_entities(db: Session) -> None:
-    """删除没有关联论文的实体"""
+def delete_paper(db: Session, paper_id: int) -> bool:
+    """删除论文及其相关文件和关系"""
+    removed = delete_papers(db, [paper_id])
+    if not removed:
+        print(f"Paper with id {paper_id} not found")
+        return False
+    remove_paper_files(removed[0])
+    return True
+
+@metrics.timed
+def cleanup_unused_entities(db: Session) -> int:
+    """删除没有关联论文的实体，返回删除的数量"""
     try:
-        # 找到没有关联论文的实体
-        unused_entities = db.query(Entity).filter(
-            ~Entity.papers.any()
-        ).all()
-        
-        # 删除这些实体
-        for entity in unused_entities:
-            db.delete(entity)
-        
+        result = db.execute(Entity.__table__.delete().where(
+            ~exists().where(papers_entities.c.entity_id == Entity.__table__.c.entity_id)
+        ))
         db.commit()
+        return result.rowcount
     except Exception as e:
         db.rollback()
         print(f"Error cleaning up entities: {e}")
+        return 0
 
-def search_papers_by_entity(
-    db: Session,
-    entity_name: str,
-    entity_type: Optional[str] = None,
-    limit: Optional[int] = None
-) -> List[Paper]:
+def get_job(db: Session, job_id: int) -> Optional[IngestJob]:
+    return db.query(IngestJob).filter(IngestJob.job_id == job_id).first()
+
+def claim_job(db: Session, job_id: int) -> bool:
+    """将任务从 pending 原子地标记为 running，避免同一任务被多个进程重复执行"""
+    claimed = db.query(IngestJob).filter(
+        IngestJob.job_id == job_id,
+        IngestJob.status == "pending"
+    ).update({"status": "running", "stage": "starting"}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def heartbeat_job(db: Session, job_id: int) -> None:
+    """更新运行中任务的 updated_at，表明执行进程仍然存活"""
+    db.query(IngestJob).filter(
+        IngestJob.job_id == job_id,
+        IngestJob.status == "running"
+    ).update({"updated_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+def requeue_stale_job(db: Session, job_id: int, stale_before: datetime) -> bool:
     """
-    根据实体名称和类型搜索论文
+    把 stale_before 之后没有心跳的 running 任务原子地改回 pending
+    多个API进程同时检查时只有一个会成功，返回是否由本次调用改回
     """
-    query = db.query(Paper).distinct().join(
-        papers_entities,
-        Paper.paper_id == papers_entities.c.paper_id
-    ).join(
-        Entity,
-        papers_entities.c.entity_id == Entity.entity_id
-    ).filter(
-        Entity.entity_name.ilike(f"%{entity_name}%")
+    requeued = db.query(IngestJob).filter(
+        IngestJob.job_id == job_id,
+        IngestJob.status == "running",
+        IngestJob.updated_at < stale_before
+    ).update(
+        {"status": "pending", "stage": "queued", "progress": 0},
+        synchronize_session=False
     )
-    
-    if entity_type:
-        query = query.filter(Entity.entity_type == entity_type)
-    
-    if limit:
-        query = query.limit(limit)
-    
-    return query.all() 
\ No newline at end of file
+    db.commit()
+    return requeued == 1
+
+def update_job(db: Session, job_id: int, **fields: Any) -> None:
+    db.query(IngestJob).filter(IngestJob.job_id == job_id).update(
+        fields, synchronize_session=False
+    )
+    db.commit()
+
+def get_unfinished_jobs(db: Session) -> List[IngestJob]:
+    return db.query(IngestJob).filter(
+        IngestJob.status.in_(["pending", "running"])
+    ).order_by(IngestJob.job_id).all()
@@ -0,0 +1,241 @@
+"""
+crud 的异步版本，供 API 路由在 AsyncSession 上使用
+
+与 crud 中的同名函数语义一致；写入论文、实体的批量导入仍走同步的 crud，
+由命令行工具和后台任务进程调用。
+"""
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.models.models import Paper, Entity, EntityTypeStat, IngestJob, CorpusState, mentions, papers_entities
+from app.services import crud, entity_search, fulltext
+
+async def get_paper(db: AsyncSession, paper_id: int) -> Optional[Paper]:
+    return await db.get(Paper, paper_id)
+
+async def get_papers(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[Paper]:
+    result = await db.execute(select(Paper).offset(skip).limit(limit))
+    return result.scalars().all()
+
+async def get_paper_by_name(db: AsyncSession, paper_name: str) -> Optional[Paper]:
+    result = await db.execute(select(Paper).where(Paper.paper_name == paper_name).limit(1))
+    return result.scalars().first()
+
+async def get_paper_by_hash(db: AsyncSession, content_hash: str) -> Optional[Paper]:
+    result = await db.execute(select(Paper).where(Paper.content_hash == content_hash).limit(1))
+    return result.scalars().first()
+
+async def find_paper_ids(
+    db: AsyncSession,
+    paper_ids: Optional[List[int]] = None,
+    name_prefix: Optional[str] = None
+) -> List[int]:
+    """按ID列表和/或名称前缀查找论文ID"""
+    query = select(Paper.paper_id)
+    if paper_ids is not None:
+        query = query.where(Paper.paper_id.in_(paper_ids))
+    if name_prefix is not None:
+        query = query.where(Paper.paper_name.startswith(name_prefix, autoescape=True))
+    return (await db.execute(query.order_by(Paper.paper_id))).scalars().all()
+
+async def get_paper_names(db: AsyncSession, paper_ids: List[int]) -> Dict[int, str]:
+    """批量获取论文名称"""
+    if not paper_ids:
+        return {}
+    result = await db.execute(
+        select(Paper.paper_id, Paper.paper_name).where(Paper.paper_id.in_(paper_ids))
+    )
+    return dict(result.all())
+
+@metrics.timed
+async def get_entities(
+    db: AsyncSession,
+    after_id: Optional[int] = None,
+    limit: int = 100
+) -> List[Dict[str, Any]]:
+    """
+    获取实体列表，包含每个实体关联的论文信息
+    按 entity_id 做键集分页：after_id 为上一页最后一个实体的ID
+    """
+    query = select(Entity)
+    if after_id is not None:
+        query = query.where(Entity.entity_id > after_id)
+    entities = (await db.execute(query.order_by(Entity.entity_id).limit(limit))).scalars().all()
+    if not entities:
+        return []
+
+    # 一次查询取回本页所有实体关联的论文及出现次数
+    papers_by_entity: Dict[int, List[Dict[str, Any]]] = {
+        entity.entity_id: [] for entity in entities
+    }
+    rows = await db.execute(
+        select(
+            papers_entities.c.entity_id,
+            Paper.paper_id,
+            Paper.paper_name,
+            papers_entities.c.count
+        ).join(
+            Paper, Paper.paper_id == papers_entities.c.paper_id
+        ).where(
+            papers_entities.c.entity_id.in_(list(papers_by_entity))
+        ).order_by(papers_entities.c.entity_id, Paper.paper_id)
+    )
+
+    for entity_id, paper_id, paper_name, count in rows:
+        papers_by_entity[entity_id].append({
+            "paper_id": paper_id,
+            "paper_name": paper_name,
+            "count": count or 0
+        })
+
+    return [
+        {
+            "entity_id": entity.entity_id,
+            "entity_name": entity.entity_name,
+            "entity_type": entity.entity_type,
+            "papers": papers_by_entity[entity.entity_id]
+        }
+        for entity in entities
+    ]
+
+@metrics.timed
+async def search_entities(
+    db: AsyncSession,
+    query: str,
+    entity_type: Optional[str] = None,
+    prefix: bool = False,
+    limit: Optional[int] = None
+) -> List[Entity]:
+    """
+    不区分大小写地搜索实体名称
+    prefix 为 True 时只匹配前缀（B-tree 范围扫描），否则匹配子串（trigram 索引）
+    """
+    search = select(Entity)
+    if entity_type:
+        search = search.where(Entity.entity_type == entity_type)
+    if prefix:
+        search = search.where(entity_search.prefix_filter(query)).order_by(Entity.entity_norm)
+    else:
+        search = search.where(entity_search.substring_filter(db.bind, query))
+    if limit:
+        search = search.limit(limit)
+    return (await db.execute(search)).scalars().all()
+
+@metrics.timed
+async def get_mentions(
+    db: AsyncSession,
+    paper_id: int,
+    entity_id: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    按位置顺序返回论文中实体的出现位置，entity_id 为空时返回所有实体
+    after 为上一页最后一条的 start_char，用于翻页
+    """
+    query = select(
+        mentions.c.entity_id,
+        Entity.entity_name,
+        Entity.entity_type,
+        mentions.c.start_char,
+        mentions.c.end_char
+    ).join(
+        Entity, Entity.entity_id == mentions.c.entity_id
+    ).where(mentions.c.paper_id == paper_id)
+    if entity_id is not None:
+        query = query.where(mentions.c.entity_id == entity_id)
+    if after is not None:
+        query = query.where(mentions.c.start_char > after)
+    query = query.order_by(mentions.c.start_char)
+    if limit:
+        query = query.limit(limit)
+    return [dict(row._mapping) for row in await db.execute(query)]
+
+@metrics.timed
+async def get_entity_statistics(db: AsyncSession, limit: int = 10) -> Dict[str, Any]:
+    """读取增量维护的统计表（见 crud.get_entity_statistics）"""
+    type_stats = (await db.execute(
+        select(
+            EntityTypeStat.entity_type,
+            EntityTypeStat.entity_count,
+            EntityTypeStat.total_mentions
+        ).where(EntityTypeStat.entity_count > 0).order_by(EntityTypeStat.entity_type)
+    )).all()
+
+    common_entities = (await db.execute(
+        select(
+            Entity.entity_name,
+            Entity.entity_type,
+            Entity.paper_count,
+            Entity.total_mentions
+        ).where(Entity.paper_count > 0).order_by(Entity.paper_count.desc()).limit(limit)
+    )).all()
+
+    return crud.format_entity_statistics(type_stats, common_entities)
+
+@metrics.timed
+async def search_fulltext(db: AsyncSession, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """全文检索（见 fulltext.search）"""
+    return await db.run_sync(fulltext.search, query, limit)
+
+async def delete_papers(db: AsyncSession, paper_ids: List[int]) -> List[Any]:
+    """批量删除论文（见 crud.delete_papers），文件在后台线程池中删除"""
+    removed = await db.run_sync(crud.delete_papers, paper_ids)
+    crud.remove_paper_files_in_background(removed)
+    return removed
+
+async def delete_paper(db: AsyncSession, paper_id: int) -> bool:
+    """删除论文及其相关文件和关系，不再关联任何论文的实体一并删除"""
+    return bool(await delete_papers(db, [paper_id]))
+
+async def cleanup_unused_entities(db: AsyncSession) -> int:
+    """删除没有关联论文的实体，返回删除的数量"""
+    return await db.run_sync(crud.cleanup_unused_entities)
+
+async def create_job(
+    db: AsyncSession,
+    file_name: str,
+    file_path: str,
+    content_hash: Optional[str] = None,
+    **fields: Any
+) -> IngestJob:
+    """创建后台处理任务，fields 可直接指定 status、paper_id 等初始状态"""
+    db_job = IngestJob(
+        file_name=file_name,
+        file_path=file_path,
+        content_hash=content_hash,
+        **fields
+    )
+    db.add(db_job)
+    await db.commit()
+    await db.refresh(db_job)
+    return db_job
+
+async def get_job(db: AsyncSession, job_id: int) -> Optional[IngestJob]:
+    # populate_existing：任务状态由后台进程更新，不使用会话中的旧对象
+    result = await db.execute(
+        select(IngestJob).where(IngestJob.job_id == job_id).execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+async def get_active_job(
+    db: AsyncSession,
+    content_hash: Optional[str] = None,
+    file_name: Optional[str] = None
+) -> Optional[IngestJob]:
+    """查找内容哈希或文件名相同、尚未结束的任务"""
+    query = select(IngestJob).where(IngestJob.status.in_(["pending", "running"]))
+    if content_hash is not None:
+        query = query.where(IngestJob.content_hash == content_hash)
+    if file_name is not None:
+        query = query.where(IngestJob.file_name == file_name)
+    result = await db.execute(query.order_by(IngestJob.job_id).limit(1))
+    return result.scalars().first()
+
+async def get_corpus_version(db: AsyncSession) -> int:
+    """当前语料版本号（见 crud.get_corpus_version）"""
+    result = await db.execute(select(CorpusState.version).where(CorpusState.state_id == 1))
+    return result.scalar() or 0
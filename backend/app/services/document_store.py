@@ -0,0 +1,113 @@
+"""
+简化文档（simplify_docx 的输出）的分段存储
+
+正文的每个顶层块（段落、表格等）保存为一行紧凑 JSON（NDJSON），
+另存偏移索引 .idx：n+1 个小端 u64，依次为每行在 .ndjson 中的起始字节偏移及文件末尾。
+读取第 [start, end) 个块只需读取索引中的两个偏移和对应的字节区间，不解析整个文档。
+"""
+import json
+import os
+import struct
+import tempfile
+from typing import Any, Dict, Iterator, List
+
+_OFFSET = struct.Struct("<Q")
+
+# 单次读取的最大块数
+MAX_RANGE = 500
+
+def content_path(paper_json: str) -> str:
+    """论文简化文档的 NDJSON 路径；旧版整体 JSON 文件转换后存放在同名 .ndjson"""
+    root, ext = os.path.splitext(paper_json)
+    return root + ".ndjson" if ext == ".json" else paper_json
+
+def index_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".idx"
+
+def exists(path: str) -> bool:
+    return os.path.exists(path) and os.path.exists(index_path(path))
+
+def body_blocks(document: Dict[str, Any]) -> List[Any]:
+    """取出文档正文的顶层块列表"""
+    for part in document.get("VALUE", []):
+        if isinstance(part, dict) and part.get("TYPE") == "body":
+            return part.get("VALUE", [])
+    return []
+
+def block_text(block: Any) -> str:
+    """块中的纯文本：段落内的文本片段直接拼接，表格单元格等其他子块之间以空格分隔"""
+    if not isinstance(block, dict):
+        return ""
+    value = block.get("VALUE")
+    if block.get("TYPE") == "text":
+        return value if isinstance(value, str) else ""
+    if not isinstance(value, list):
+        return ""
+    parts = [block_text(child) for child in value]
+    if block.get("TYPE") == "paragraph":
+        return "".join(parts)
+    return " ".join(part for part in parts if part)
+
+def write_document(document: Dict[str, Any], path: str) -> None:
+    """把简化文档写为 NDJSON 及偏移索引（先写临时文件再改名）"""
+    # 临时文件名唯一，并发生成同一文档时各自写入再改名
+    directory = os.path.dirname(path) or "."
+    data_fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    tmp_index = None
+    try:
+        offsets = [0]
+        with os.fdopen(data_fd, "wb") as f:
+            for block in body_blocks(document):
+                f.write(json.dumps(block, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+                f.write(b"\n")
+                offsets.append(f.tell())
+        index_fd, tmp_index = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(index_fd, "wb") as f:
+            f.write(b"".join(_OFFSET.pack(offset) for offset in offsets))
+        # 索引最后就位，exists() 为真时两个文件都已完整
+        os.replace(tmp_path, path)
+        os.replace(tmp_index, index_path(path))
+    finally:
+        for leftover in (tmp_path, tmp_index):
+            if leftover is not None and os.path.exists(leftover):
+                os.remove(leftover)
+
+def convert_legacy(json_path: str, path: str) -> None:
+    """把旧版整体保存的简化JSON转换为分段格式"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        write_document(json.load(f), path)
+
+def block_count(path: str) -> int:
+    return os.path.getsize(index_path(path)) // _OFFSET.size - 1
+
+def _read_offset(index_file, position: int) -> int:
+    index_file.seek(position * _OFFSET.size)
+    return _OFFSET.unpack(index_file.read(_OFFSET.size))[0]
+
+def read_blocks(path: str, start: int, end: int) -> List[Any]:
+    """读取第 [start, end) 个块，范围超出文档时截断"""
+    end = min(end, block_count(path))
+    if start >= end:
+        return []
+    with open(index_path(path), "rb") as index_file:
+        low = _read_offset(index_file, start)
+        high = _read_offset(index_file, end)
+    with open(path, "rb") as f:
+        f.seek(low)
+        data = f.read(high - low)
+    return [json.loads(line) for line in data.splitlines()]
+
+def iter_document_json(path: str, chunk_lines: int = 256) -> Iterator[bytes]:
+    """按原有的嵌套结构流式输出整个文档的 JSON"""
+    yield b'{"TYPE":"document","VALUE":[{"TYPE":"body","VALUE":['
+    with open(path, "rb") as f:
+        lines = []
+        first = True
+        for line in f:
+            lines.append(line.rstrip(b"\n"))
+            if len(lines) >= chunk_lines:
+                yield (b"" if first else b",") + b",".join(lines)
+                lines, first = [], False
+        if lines:
+            yield (b"" if first else b",") + b",".join(lines)
+    yield b"]}]}"
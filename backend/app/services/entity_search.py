@@ -0,0 +1,83 @@
+"""
+实体名称检索索引
+
+entities.entity_norm 为规范化（折叠空白、casefold）后的名称：
+- 前缀查询走 (entity_norm) / (entity_type, entity_norm) 上的 B-tree 范围扫描；
+- 子串查询在 SQLite 上走 FTS5 trigram 外部内容表（由触发器与 entities 同步），
+  在 PostgreSQL 上走 pg_trgm GIN 索引，其他情况退回 LIKE。
+"""
+from sqlalchemy import column, text
+
+from app.models.models import Entity
+
+TRIGRAM_TABLE = "entity_trigram"
+
+# 前缀范围查询的上界字符
+MAX_CHAR = "\U0010ffff"
+
+def normalize_name(name: str) -> str:
+    """规范化实体名称：折叠空白并做大小写折叠"""
+    return " ".join(name.split()).casefold()
+
+def create_index(engine) -> None:
+    """创建子串检索用的 trigram 索引"""
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+            ), {"name": TRIGRAM_TABLE}).first()
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TRIGRAM_TABLE} USING fts5("
+                f"entity_norm, content='entities', content_rowid='entity_id', tokenize='trigram')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {TRIGRAM_TABLE}_ai AFTER INSERT ON entities BEGIN "
+                f"INSERT INTO {TRIGRAM_TABLE}(rowid, entity_norm) VALUES (new.entity_id, new.entity_norm); "
+                f"END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {TRIGRAM_TABLE}_ad AFTER DELETE ON entities BEGIN "
+                f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}, rowid, entity_norm) "
+                f"VALUES ('delete', old.entity_id, old.entity_norm); "
+                f"END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {TRIGRAM_TABLE}_au AFTER UPDATE OF entity_norm ON entities BEGIN "
+                f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}, rowid, entity_norm) "
+                f"VALUES ('delete', old.entity_id, old.entity_norm); "
+                f"INSERT INTO {TRIGRAM_TABLE}(rowid, entity_norm) VALUES (new.entity_id, new.entity_norm); "
+                f"END"
+            ))
+            if not exists:
+                # 首次创建时为已有实体建立索引
+                conn.execute(text(f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_entities_norm_trgm "
+                "ON entities USING gin (entity_norm gin_trgm_ops)"
+            ))
+
+def like_pattern(norm: str) -> str:
+    """包含 norm 的 LIKE 模式（以反斜杠转义通配符）"""
+    return "%" + norm.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def prefix_filter(prefix: str):
+    """名称以 prefix 开头（可使用索引的范围条件）"""
+    norm = normalize_name(prefix)
+    return (Entity.entity_norm >= norm) & (Entity.entity_norm < norm + MAX_CHAR)
+
+def substring_filter(bind, query: str):
+    """名称包含 query"""
+    norm = normalize_name(query)
+    # trigram 索引要求查询至少 3 个字符
+    if bind.dialect.name == "sqlite" and len(norm) >= 3:
+        phrase = '"' + norm.replace('"', '""') + '"'
+        return Entity.entity_id.in_(
+            text(f"SELECT rowid FROM {TRIGRAM_TABLE} WHERE {TRIGRAM_TABLE} MATCH :trigram_query")
+            .bindparams(trigram_query=phrase)
+            .columns(column("rowid"))
+        )
+    return Entity.entity_norm.like(like_pattern(norm), escape="\\")
@@ -0,0 +1,112 @@
+"""
+基于 SQLite FTS5 的论文全文索引
+
+每个段落一行，rowid = paper_id << PARAGRAPH_BITS | 段落序号，
+删除论文时按 rowid 范围删除，不需要扫描整个索引。
+"""
+from typing import Any, Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+FTS_TABLE = "paper_fts"
+
+# rowid 低位存放段落序号
+PARAGRAPH_BITS = 20
+
+def is_supported(bind) -> bool:
+    return bind.dialect.name == "sqlite"
+
+def create_index(engine) -> None:
+    """创建全文索引虚拟表（仅 SQLite）"""
+    if not is_supported(engine):
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(content, paper_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+        ))
+
+def _rowid_range(paper_id: int):
+    low = paper_id << PARAGRAPH_BITS
+    return low, low + (1 << PARAGRAPH_BITS) - 1
+
+def index_paper(db: Session, paper_id: int, paragraphs: List[str]) -> None:
+    """写入论文的段落文本，随调用方的事务一起提交"""
+    if not paragraphs or not is_supported(db.bind):
+        return
+    low, _ = _rowid_range(paper_id)
+    db.execute(
+        text(f"INSERT INTO {FTS_TABLE}(rowid, content, paper_id) VALUES (:rowid, :content, :paper_id)"),
+        [
+            {"rowid": low + i, "content": paragraph, "paper_id": paper_id}
+            for i, paragraph in enumerate(paragraphs[:1 << PARAGRAPH_BITS])
+        ]
+    )
+
+def remove_paper(db: Session, paper_id: int) -> None:
+    if not is_supported(db.bind):
+        return
+    low, high = _rowid_range(paper_id)
+    db.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid BETWEEN :low AND :high"),
+        {"low": low, "high": high}
+    )
+
+def remove_papers(db: Session, paper_ids: List[int]) -> None:
+    """批量删除多篇论文的段落"""
+    if not paper_ids or not is_supported(db.bind):
+        return
+    db.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid BETWEEN :low AND :high"),
+        [dict(zip(("low", "high"), _rowid_range(paper_id))) for paper_id in paper_ids]
+    )
+
+def _match_expression(query: str) -> str:
+    """把用户输入转为 FTS5 查询：每个词作为短语，词之间为 AND"""
+    terms = [term.replace('"', '""') for term in query.split()]
+    return " ".join(f'"{term}"' for term in terms)
+
+def search(
+    db: Session,
+    query: str,
+    limit: int = 20,
+    snippets_per_paper: int = 3
+) -> List[Dict[str, Any]]:
+    """
+    按 BM25 相关度检索论文，返回最相关的 limit 篇
+    每篇论文给出最高得分与得分最高的 snippets_per_paper 个命中段落的高亮片段（<mark> 标记）
+    """
+    expression = _match_expression(query)
+    if not expression:
+        return []
+    # 先在SQL中按论文分组选出前 limit 篇，只为这些论文的前几个命中段落生成片段；
+    # bm25() 只能在带 MATCH 的查询中调用，窗口函数使子查询不被展开
+    rows = db.execute(
+        text(
+            f"WITH hits AS ("
+            f"  SELECT hit, paper_id, score, "
+            f"         ROW_NUMBER() OVER (PARTITION BY paper_id ORDER BY score) AS rn "
+            f"  FROM (SELECT rowid AS hit, paper_id, bm25({FTS_TABLE}) AS score "
+            f"        FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :query)"
+            f"), top AS ("
+            f"  SELECT paper_id, score AS best FROM hits WHERE rn = 1 ORDER BY best LIMIT :limit"
+            f") "
+            f"SELECT hits.paper_id, top.best, "
+            f"snippet({FTS_TABLE}, 0, '<mark>', '</mark>', '…', 16) AS snippet "
+            f"FROM top JOIN hits ON hits.paper_id = top.paper_id AND hits.rn <= :snippets "
+            f"JOIN {FTS_TABLE} ON {FTS_TABLE}.rowid = hits.hit "
+            f"WHERE {FTS_TABLE} MATCH :query "
+            f"ORDER BY top.best, hits.paper_id, hits.rn"
+        ),
+        {"query": expression, "limit": limit, "snippets": snippets_per_paper}
+    ).all()
+
+    results: Dict[int, Dict[str, Any]] = {}
+    for paper_id, score, snippet in rows:
+        result = results.get(paper_id)
+        if result is None:
+            # bm25() 越小越相关，取反后作为得分返回
+            result = results[paper_id] = {"paper_id": paper_id, "score": -score, "snippets": []}
+        result["snippets"].append(snippet)
+    return list(results.values())
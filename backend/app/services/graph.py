@@ -0,0 +1,280 @@
+import heapq
+import json
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.models import Paper
+from app.services import crud
+
+class KnowledgeGraph:
+    """
+    内存中的论文-实体二部图
+    首次访问时全量加载，之后根据 corpus_events 只增量应用新增/删除的论文，
+    序列化结果在图发生变化前一直复用
+    事件ID按提交顺序递增（见 crud.record_corpus_events），每个事件使语料版本号加一
+    """
+
+    def __init__(self):
+        # 图对应的语料版本号与已应用的最后一个语料事件ID
+        self.version = 0
+        self.last_event_id = 0
+        self.papers: Dict[int, str] = {}
+        self.entities: Dict[int, Tuple[str, str]] = {}
+        # 邻接表：paper_id -> {entity_id: count} 与 entity_id -> {paper_id: count}
+        self.paper_edges: Dict[int, Dict[int, int]] = {}
+        self.entity_edges: Dict[int, Dict[int, int]] = {}
+        self._loaded = False
+        self._payload: Optional[bytes] = None
+        self._lock = threading.RLock()
+        # 变更监听：参数为本次变化涉及的实体ID集合，全量加载时为 None
+        self._listeners: List[Callable[[Optional[Set[int]]], None]] = []
+        self._touched: Set[int] = set()
+
+    def add_listener(self, listener: Callable[[Optional[Set[int]]], None]) -> None:
+        """注册图变化的回调，在持有图锁时调用"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def sync(self, db: Session) -> None:
+        """把数据库中尚未应用的论文增删同步到内存图"""
+        with self._lock:
+            if not self._loaded:
+                self._load(db)
+                self._notify(None)
+                return
+            self._touched = set()
+            for event in crud.get_corpus_events(db, after_id=self.last_event_id):
+                if event.action == "add":
+                    self._add_paper(db, event.paper_id)
+                elif event.action == "remove":
+                    self._remove_paper(event.paper_id)
+                self.last_event_id = event.event_id
+                self.version += 1
+                self._payload = None
+            if self._touched:
+                self._notify(self._touched)
+
+    def _notify(self, entity_ids: Optional[Set[int]]) -> None:
+        for listener in self._listeners:
+            listener(entity_ids)
+
+    def snapshot(self) -> Tuple[str, bytes]:
+        """返回 (ETag, 序列化后的图数据)"""
+        with self._lock:
+            if self._payload is None:
+                self._payload = json.dumps(self._serialize()).encode("utf-8")
+            return f'"graph-{self.version}"', self._payload
+
+    def has_node(self, node_id: str) -> bool:
+        kind, key = _parse_node_id(node_id)
+        with self._lock:
+            if kind == "p":
+                return key in self.papers
+            return key in self.entities
+
+    def neighborhood(
+        self,
+        node_id: str,
+        hops: int = 1,
+        entity_type: Optional[str] = None,
+        min_count: int = 1,
+        limit: Optional[int] = None
+    ) -> Dict[str, list]:
+        """
+        返回以 node_id（如 p12、e34）为中心的 k 跳邻域
+        只沿 count >= min_count 且实体类型匹配的边扩展；
+        limit 限制边数时从中心出发按权重优先扩展，保证保留的边都与中心连通
+        """
+        center = _parse_node_id(node_id)
+        with self._lock:
+            edges: Dict[Tuple[int, int], int] = {}
+            visited = {center}
+            frontier = [center]
+            for _ in range(hops):
+                next_frontier = []
+                for kind, key in frontier:
+                    if kind == "p":
+                        neighbors = (
+                            (("e", entity_id), (key, entity_id), count)
+                            for entity_id, count in self.paper_edges.get(key, {}).items()
+                        )
+                    else:
+                        neighbors = (
+                            (("p", paper_id), (paper_id, key), count)
+                            for paper_id, count in self.entity_edges.get(key, {}).items()
+                        )
+                    for neighbor, edge, count in neighbors:
+                        if not self._edge_matches(edge, count, entity_type, min_count, center):
+                            continue
+                        edges[edge] = count
+                        if neighbor not in visited:
+                            visited.add(neighbor)
+                            next_frontier.append(neighbor)
+                frontier = next_frontier
+            if limit is not None:
+                edges = _connected_top(edges, center, limit)
+            return self._build(edges.items(), keep=center)
+
+    def subgraph(
+        self,
+        entity_type: Optional[str] = None,
+        min_count: int = 1,
+        limit: Optional[int] = None
+    ) -> Dict[str, list]:
+        """按实体类型和最小出现次数裁剪整张图，并按权重保留前 limit 条边"""
+        with self._lock:
+            edges = (
+                ((paper_id, entity_id), count)
+                for paper_id, entity_counts in self.paper_edges.items()
+                for entity_id, count in entity_counts.items()
+                if self._edge_matches((paper_id, entity_id), count, entity_type, min_count)
+            )
+            return self._build(edges, limit)
+
+    def _edge_matches(
+        self,
+        edge: Tuple[int, int],
+        count: int,
+        entity_type: Optional[str],
+        min_count: int,
+        center: Optional[Tuple[str, int]] = None
+    ) -> bool:
+        if count < min_count:
+            return False
+        entity_id = edge[1]
+        # 中心实体本身不受类型过滤影响
+        if entity_type and center != ("e", entity_id):
+            return self.entities[entity_id][1] == entity_type
+        return True
+
+    def _build(
+        self,
+        edges: Iterable[Tuple[Tuple[int, int], int]],
+        limit: Optional[int] = None,
+        keep: Optional[Tuple[str, int]] = None
+    ) -> Dict[str, list]:
+        """把选中的边组装为 {nodes, edges}，limit 为按权重保留的最大边数"""
+        if limit is not None:
+            edges = heapq.nlargest(limit, edges, key=lambda item: item[1])
+        paper_ids = set()
+        entity_ids = set()
+        edge_list = []
+        for (paper_id, entity_id), count in edges:
+            paper_ids.add(paper_id)
+            entity_ids.add(entity_id)
+            edge_list.append({"source": f"p{paper_id}", "target": f"e{entity_id}", "value": count})
+        if keep is not None:
+            (paper_ids if keep[0] == "p" else entity_ids).add(keep[1])
+        
+        nodes: List[dict] = [
+            {"id": f"p{paper_id}", "label": self.papers[paper_id], "type": "paper"}
+            for paper_id in sorted(paper_ids)
+        ]
+        nodes.extend(
+            {"id": f"e{entity_id}", "label": self.entities[entity_id][0], "type": self.entities[entity_id][1]}
+            for entity_id in sorted(entity_ids)
+        )
+        return {"nodes": nodes, "edges": edge_list}
+
+    def _load(self, db: Session) -> None:
+        # 先记录版本号：加载期间产生的事件会在下次同步时再应用一次（应用是幂等的）
+        self.version, self.last_event_id = crud.get_corpus_state(db)
+        self.papers.clear()
+        self.entities.clear()
+        self.paper_edges.clear()
+        self.entity_edges.clear()
+        for paper_id, paper_name in db.query(Paper.paper_id, Paper.paper_name):
+            self.papers[paper_id] = paper_name
+            self.paper_edges[paper_id] = {}
+        for edge in crud.get_paper_edges(db):
+            self._add_edge(*edge)
+        self._loaded = True
+        self._payload = None
+
+    def _add_paper(self, db: Session, paper_id: int) -> None:
+        paper = crud.get_paper(db, paper_id)
+        if paper is None:
+            # 论文已被删除，对应的 remove 事件会随后应用
+            return
+        self._remove_paper(paper_id)
+        self.papers[paper_id] = paper.paper_name
+        self.paper_edges[paper_id] = {}
+        for edge in crud.get_paper_edges(db, paper_id):
+            self._add_edge(*edge)
+
+    def _remove_paper(self, paper_id: int) -> None:
+        self.papers.pop(paper_id, None)
+        for entity_id in self.paper_edges.pop(paper_id, {}):
+            self._touched.add(entity_id)
+            papers = self.entity_edges.get(entity_id)
+            if papers is None:
+                continue
+            papers.pop(paper_id, None)
+            # 不再被任何论文引用的实体从图中移除
+            if not papers:
+                del self.entity_edges[entity_id]
+                self.entities.pop(entity_id, None)
+
+    def _add_edge(self, paper_id: int, entity_id: int, entity_name: str, entity_type: str, count: int) -> None:
+        if paper_id not in self.papers:
+            return
+        self.entities[entity_id] = (entity_name, entity_type)
+        self._touched.add(entity_id)
+        self.paper_edges[paper_id][entity_id] = count or 0
+        self.entity_edges.setdefault(entity_id, {})[paper_id] = count or 0
+
+    def _serialize(self) -> Dict[str, list]:
+        nodes = [
+            {"id": f"p{paper_id}", "label": paper_name, "type": "paper"}
+            for paper_id, paper_name in self.papers.items()
+        ]
+        nodes.extend(
+            {"id": f"e{entity_id}", "label": entity_name, "type": entity_type}
+            for entity_id, (entity_name, entity_type) in self.entities.items()
+        )
+        edges = [
+            {"source": f"p{paper_id}", "target": f"e{entity_id}", "value": count}
+            for paper_id, entity_counts in self.paper_edges.items()
+            for entity_id, count in entity_counts.items()
+        ]
+        return {"nodes": nodes, "edges": edges}
+
+def _connected_top(
+    edges: Dict[Tuple[int, int], int],
+    center: Tuple[str, int],
+    limit: int
+) -> Dict[Tuple[int, int], int]:
+    """从 center 出发，每次选取与已选部分相连的权重最大的边，直到 limit 条"""
+    adjacency: Dict[Tuple[str, int], List[Tuple[int, int]]] = {}
+    for edge in edges:
+        adjacency.setdefault(("p", edge[0]), []).append(edge)
+        adjacency.setdefault(("e", edge[1]), []).append(edge)
+
+    selected: Dict[Tuple[int, int], int] = {}
+    reached = {center}
+    candidates = [(-edges[edge], edge) for edge in adjacency.get(center, [])]
+    heapq.heapify(candidates)
+    while candidates and len(selected) < limit:
+        _, edge = heapq.heappop(candidates)
+        if edge in selected:
+            continue
+        selected[edge] = edges[edge]
+        for node in (("p", edge[0]), ("e", edge[1])):
+            if node not in reached:
+                reached.add(node)
+                for next_edge in adjacency[node]:
+                    if next_edge not in selected:
+                        heapq.heappush(candidates, (-edges[next_edge], next_edge))
+    return selected
+
+def _parse_node_id(node_id: str) -> Tuple[str, int]:
+    """把 p12 / e34 形式的节点ID解析为 ("p", 12) / ("e", 34)"""
+    kind, key = node_id[:1], node_id[1:]
+    if kind not in ("p", "e") or not key.isdigit():
+        raise ValueError(f"无效的节点ID: {node_id}")
+    return kind, int(key)
+
+# 进程内共享的知识图谱
+knowledge_graph = KnowledgeGraph()
@@ -0,0 +1,165 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.session import SessionLocal, engine
+from app.services import crud
+from app.services.nlp import worker_context
+
+# 后台处理进程池（首次提交任务时创建）
+_executor: Optional[ProcessPoolExecutor] = None
+# API进程中定期重新排队失去心跳的任务
+_watchdog: Optional[threading.Thread] = None
+_stopping = threading.Event()
+# API进程中正在生成的按需产物（键为产物路径），相同产物的并发请求共用一次生成
+_artifact_tasks: Dict[str, "asyncio.Future[Any]"] = {}
+
+def _init_worker() -> None:
+    """子进程初始化：丢弃从父进程继承的数据库连接和指标"""
+    engine.dispose()
+    metrics.registry.collect(reset=True)
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.INGEST_WORKERS,
+            mp_context=worker_context(),
+            initializer=_init_worker
+        )
+    return _executor
+
+def submit_job(job_id: int) -> None:
+    """将任务交给后台进程池执行"""
+    get_executor().submit(run_job, job_id).add_done_callback(_merge_metrics)
+
+async def run_exclusive(key: str, func: Callable[..., Any], *args: Any) -> Any:
+    """在后台进程池中执行 func(*args)，同一 key 同时只执行一次，其余请求等待同一结果
+
+    func 及参数需可序列化（模块级函数和路径等普通值，不能传ORM对象）
+    """
+    task = _artifact_tasks.get(key)
+    if task is None:
+        task = asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
+        _artifact_tasks[key] = task
+        task.add_done_callback(lambda _: _artifact_tasks.pop(key, None))
+    # 客户端断开时不取消共享的生成任务
+    return await asyncio.shield(task)
+
+def _merge_metrics(future: Future) -> None:
+    """把工作进程中记录的指标合并到主进程"""
+    if not future.cancelled() and future.exception() is None:
+        metrics.registry.merge(future.result())
+
+def run_job(job_id: int) -> Dict[str, Any]:
+    """在工作进程中执行任务，返回本次任务期间记录的指标增量"""
+    _run_job(job_id)
+    return metrics.registry.collect(reset=True)
+
+def _run_job(job_id: int) -> None:
+    """执行PDF处理流程，并把状态和进度写回数据库"""
+    # 延迟导入，避免API进程加载处理流程依赖
+    from app.services.pdf_processor import process_pdf
+
+    db = SessionLocal()
+    stop_heartbeat = threading.Event()
+    try:
+        if not crud.claim_job(db, job_id):
+            return
+        threading.Thread(
+            target=_heartbeat, args=(job_id, stop_heartbeat), daemon=True
+        ).start()
+        job = crud.get_job(db, job_id)
+
+        # 相同内容可能已由其他任务处理完成
+        if job.content_hash:
+            paper = crud.get_paper_by_hash(db, job.content_hash)
+            if paper is not None:
+                crud.update_job(
+                    db, job_id,
+                    status="done", stage="done", progress=100,
+                    paper_id=paper.paper_id
+                )
+                return
+
+        def report(stage: str, progress: int) -> None:
+            crud.update_job(db, job_id, stage=stage, progress=progress)
+
+        # 文件按内容哈希保存为 source.pdf，论文名称取上传时的文件名
+        paper = process_pdf(
+            job.file_path, db,
+            content_hash=job.content_hash,
+            paper_name=os.path.splitext(job.file_name)[0],
+            progress=report
+        )
+        crud.update_job(
+            db, job_id,
+            status="done", stage="done", progress=100,
+            paper_id=paper.paper_id
+        )
+    except Exception as e:
+        db.rollback()
+        print(f"Ingest job {job_id} failed: {e}")
+        crud.update_job(db, job_id, status="failed", error=str(e))
+    finally:
+        stop_heartbeat.set()
+        db.close()
+
+def _heartbeat(job_id: int, stop: threading.Event) -> None:
+    """任务执行期间定期更新心跳（使用独立的会话）"""
+    while not stop.wait(settings.JOB_HEARTBEAT_INTERVAL):
+        db = SessionLocal()
+        try:
+            crud.heartbeat_job(db, job_id)
+        except Exception as e:
+            print(f"Heartbeat for job {job_id} failed: {e}")
+        finally:
+            db.close()
+
+def resume_jobs(include_pending: bool = True) -> None:
+    """
+    重新提交未完成的任务：pending 任务直接提交（执行前的 claim_job 保证只执行一次），
+    running 任务只有在心跳超时后才由本进程原子地改回 pending 再提交，
+    仍由其他进程执行中的任务不受影响
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=settings.JOB_STALE_AFTER)
+    db = SessionLocal()
+    try:
+        for job in crud.get_unfinished_jobs(db):
+            if job.status == "running":
+                if not crud.requeue_stale_job(db, job.job_id, stale_before):
+                    continue
+            elif not include_pending:
+                continue
+            submit_job(job.job_id)
+    finally:
+        db.close()
+
+def _watch_stale_jobs() -> None:
+    # 只处理心跳超时的任务；pending 任务已在提交它们的进程的队列中
+    while not _stopping.wait(settings.JOB_HEARTBEAT_INTERVAL):
+        try:
+            resume_jobs(include_pending=False)
+        except Exception as e:
+            print(f"Checking unfinished jobs failed: {e}")
+
+def start_watchdog() -> None:
+    """启动后台线程，定期重新提交失去心跳的任务（如执行进程崩溃或服务重启前中断的任务）"""
+    global _watchdog
+    if _watchdog is None:
+        _stopping.clear()
+        _watchdog = threading.Thread(target=_watch_stale_jobs, name="job-watchdog", daemon=True)
+        _watchdog.start()
+
+def shutdown() -> None:
+    global _executor, _watchdog
+    _stopping.set()
+    _watchdog = None
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
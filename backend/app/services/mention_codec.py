@@ -0,0 +1,85 @@
+"""
+实体识别结果的紧凑二进制格式（缓存在内容寻址目录的 mentions.bin）
+
+实体文本可由全文按偏移切出，因此只按列存储 起始偏移 / 结束偏移 / 标签序号：
+
+    b"MNT1" | 标签数 u16 | 每个标签: 长度 u16 + UTF-8 | 实体数 u32
+    | start_char u32 × n | end_char u32 × n | 标签序号 u16 × n
+
+全部为小端序，每个实体 10 字节，约为 JSON 列表的十分之一。
+"""
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List
+
+from app.services import storage
+
+MAGIC = b"MNT1"
+
+def _little_endian(values: array) -> array:
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+def pack(entities: List[Dict[str, Any]]) -> bytes:
+    """把实体识别结果（含 start_char、end_char、label）编码为二进制"""
+    labels: Dict[str, int] = {}
+    starts, ends, label_ids = array("I"), array("I"), array("H")
+    for ent in entities:
+        starts.append(ent["start_char"])
+        ends.append(ent["end_char"])
+        label_ids.append(labels.setdefault(ent["label"], len(labels)))
+
+    parts = [MAGIC, struct.pack("<H", len(labels))]
+    for label in labels:
+        encoded = label.encode("utf-8")
+        parts.append(struct.pack("<H", len(encoded)))
+        parts.append(encoded)
+    parts.append(struct.pack("<I", len(starts)))
+    for column in (starts, ends, label_ids):
+        parts.append(_little_endian(column).tobytes())
+    return b"".join(parts)
+
+def unpack(data: bytes, text: str) -> List[Dict[str, Any]]:
+    """解码为实体识别结果列表，实体文本从全文 text 中按偏移切出"""
+    if data[:4] != MAGIC:
+        raise ValueError("不是有效的实体位置文件")
+    position = 4
+    (label_count,) = struct.unpack_from("<H", data, position)
+    position += 2
+    labels = []
+    for _ in range(label_count):
+        (length,) = struct.unpack_from("<H", data, position)
+        position += 2
+        labels.append(data[position:position + length].decode("utf-8"))
+        position += length
+    (count,) = struct.unpack_from("<I", data, position)
+    position += 4
+
+    columns = []
+    for typecode in ("I", "I", "H"):
+        column = array(typecode)
+        size = column.itemsize * count
+        column.frombytes(data[position:position + size])
+        columns.append(_little_endian(column))
+        position += size
+
+    starts, ends, label_ids = columns
+    return [
+        {
+            "text": text[start:end],
+            "start_char": start,
+            "end_char": end,
+            "label": labels[label_id]
+        }
+        for start, end, label_id in zip(starts, ends, label_ids)
+    ]
+
+def write(path: str, entities: List[Dict[str, Any]]) -> None:
+    """原子地写入缓存文件（见 storage.write_atomic）"""
+    storage.write_atomic(path, pack(entities))
+
+def read(path: str, text: str) -> List[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        return unpack(f.read(), text)
@@ -0,0 +1,61 @@
+"""
+spaCy 模型注册表
+
+模型在第一次做实体识别时才加载，每个进程中同名模型只加载一次。
+只提供读接口的API进程因此不需要导入 spaCy。
+后台处理进程池可以用 fork-server 方式启动：模型在 fork-server 父进程中预先加载，
+子进程通过写时复制共享这份内存。
+"""
+import multiprocessing
+import threading
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+# 实体识别只用到 ner，其余组件在加载时排除
+UNUSED_PIPES = [
+    "tagger", "parser", "attribute_ruler", "lemmatizer",
+    "morphologizer", "senter", "sentencizer"
+]
+
+_models: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+def load_ner_model(name: str):
+    """加载只保留实体识别所需组件的 spaCy 模型"""
+    import spacy
+
+    model = spacy.load(name, exclude=UNUSED_PIPES)
+    # 共享的 tok2vec/transformer 若不被 ner 使用，同样禁用
+    for pipe_name in ("tok2vec", "transformer"):
+        if pipe_name in model.pipe_names:
+            listeners = getattr(model.get_pipe(pipe_name), "listening_components", [])
+            if "ner" not in listeners:
+                model.disable_pipe(pipe_name)
+    return model
+
+def get_nlp(name: Optional[str] = None):
+    """获取已加载的模型，默认使用 settings.SPACY_MODEL"""
+    name = name or settings.SPACY_MODEL
+    model = _models.get(name)
+    if model is None:
+        with _lock:
+            model = _models.get(name)
+            if model is None:
+                model = _models[name] = load_ner_model(name)
+    return model
+
+def is_loaded(name: Optional[str] = None) -> bool:
+    return (name or settings.SPACY_MODEL) in _models
+
+def worker_context():
+    """
+    返回处理进程池使用的 multiprocessing 上下文
+    开启 PRELOAD_SPACY_MODEL 时使用 fork-server，并在其父进程中预加载模型
+    """
+    if settings.PRELOAD_SPACY_MODEL and \
+       "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["app.services.nlp_preload"])
+        return context
+    return None
@@ -0,0 +1,6 @@
+"""
+在 fork-server 父进程中导入本模块以预加载 spaCy 模型（见 nlp.worker_context）
+"""
+from app.services.nlp import get_nlp
+
+get_nlp()
@@ -0,0 +1,144 @@
+"""
+按页并行处理大型PDF
+
+页数达到 settings.PAGE_PARALLEL_THRESHOLD 时，把文档切分为连续的页范围，
+交给进程池分别处理，再按页序合并：
+- 文本提取：各进程用 PyMuPDF 提取本范围的段落，按范围顺序拼接
+- PDF→DOCX：各进程用 pdf2docx 解析本范围的页面，返回解析结果（Converter.store()），
+  主进程恢复到同一个 Converter 后统一生成DOCX
+
+pdf2docx 自带的 multi_processing 在当前目录写固定文件名的临时JSON，
+多个后台任务同时转换时会互相覆盖，因此这里不使用它。
+"""
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# 每个进程至少处理的页数，页数不多时少开进程
+MIN_PAGES_PER_WORKER = 8
+
+PageRange = Tuple[int, int]
+
+# 按页处理的进程池（首次处理大型文档时创建，之后复用以免每篇都重新启动进程）
+_executor: Optional[ProcessPoolExecutor] = None
+
+def page_count(pdf_path: str) -> int:
+    import fitz
+
+    with fitz.open(pdf_path) as pdf:
+        return pdf.page_count
+
+def page_ranges(count: int, parts: int) -> List[PageRange]:
+    """把 [0, count) 均分为 parts 个连续的页范围"""
+    parts = max(1, min(parts, count))
+    size, extra = divmod(count, parts)
+    ranges = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def plan(pdf_path: str) -> List[PageRange]:
+    """按配置切分页范围；返回单个范围表示应在当前进程中处理"""
+    count = page_count(pdf_path)
+    if count < settings.PAGE_PARALLEL_THRESHOLD or settings.PAGE_WORKERS <= 1:
+        return [(0, count)]
+    return page_ranges(count, min(settings.PAGE_WORKERS, count // MIN_PAGES_PER_WORKER))
+
+def _pool_context():
+    # 调用方可能是带线程池的API进程，避免直接 fork
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.PAGE_WORKERS,
+            mp_context=_pool_context()
+        )
+    return _executor
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+def _map_ranges(func: Callable[[str, int, int], Any], pdf_path: str, ranges: List[PageRange]) -> List[Any]:
+    """在进程池中对每个页范围执行 func，结果按页序返回"""
+    executor = get_executor()
+    futures = [executor.submit(func, pdf_path, start, end) for start, end in ranges]
+    return [future.result() for future in futures]
+
+def extract_range(pdf_path: str, start: int, end: int) -> List[str]:
+    """按文本块提取第 [start, end) 页的段落"""
+    import fitz
+
+    paragraphs = []
+    with fitz.open(pdf_path) as pdf:
+        for page_no in range(start, end):
+            for block in pdf[page_no].get_text("blocks", sort=True):
+                # block: (x0, y0, x1, y1, text, block_no, block_type)，block_type 为 0 表示文本
+                if block[6] != 0:
+                    continue
+                lines = [line.strip() for line in block[4].splitlines() if line.strip()]
+                if lines:
+                    paragraphs.append(" ".join(lines))
+    return paragraphs
+
+def extract_paragraphs(pdf_path: str) -> List[str]:
+    ranges = plan(pdf_path)
+    if len(ranges) == 1:
+        return extract_range(pdf_path, *ranges[0])
+    paragraphs = []
+    for part in _map_ranges(extract_range, pdf_path, ranges):
+        paragraphs.extend(part)
+    return paragraphs
+
+def parse_range(pdf_path: str, start: int, end: int) -> Dict[str, Any]:
+    """用 pdf2docx 解析第 [start, end) 页，返回可序列化的解析结果"""
+    from pdf2docx import Converter
+
+    converter = Converter(pdf_path)
+    try:
+        # 与 pdf2docx 的多进程模式相同：载入全部页面，只解析本范围内的页
+        converter.load_pages()
+        for page in converter.pages:
+            page.skip_parsing = not start <= page.id < end
+        options = converter.default_settings
+        converter.parse_document(**options).parse_pages(**options)
+        return converter.store()
+    finally:
+        converter.close()
+
+def convert_to_docx(pdf_path: str, docx_path: str) -> None:
+    """PDF→DOCX，大型文档按页范围并行解析；先写临时文件再改名，避免读到不完整的DOCX"""
+    from pdf2docx import Converter, parse
+
+    fd, tmp_path = tempfile.mkstemp(suffix=".docx", dir=os.path.dirname(docx_path) or ".")
+    os.close(fd)
+    try:
+        ranges = plan(pdf_path)
+        if len(ranges) == 1:
+            parse(pdf_path, tmp_path)
+        else:
+            parsed = _map_ranges(parse_range, pdf_path, ranges)
+            converter = Converter(pdf_path)
+            try:
+                for data in parsed:
+                    converter.restore(data)
+                converter.make_docx(tmp_path, **converter.default_settings)
+            finally:
+                converter.close()
+        os.replace(tmp_path, docx_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,176 @@
+"""
+论文查询语言
+
+语法（不区分大小写）：
+    get [one|all] papers that mention <条件> [and|or <条件>] ...
+    <条件> := [person|organisation|work] <实体名称>
+
+查询先解析为语法树，再编译为一条参数化 SQL：
+每个条件是一条倒排表（papers_have_entities）查询，and 编译为 INTERSECT，
+or 编译为 UNION（and 优先级高于 or）。实体名称按规范化名称做子串匹配（不区分大小写）：
+SQLite 上名称不少于 3 个字符时走 entity_trigram 索引，其他情况用 LIKE
+（PostgreSQL 上由 pg_trgm 索引加速），见 entity_search。
+编译结果按查询结构（不含实体名称）缓存，名称只作为绑定参数传入。
+"""
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.models import Paper
+from app.services.entity_search import TRIGRAM_TABLE, like_pattern, normalize_name
+
+ENTITY_TYPES = {
+    "person": "PERSON",
+    "organisation": "ORG",
+    "work": "WORK_OF_ART"
+}
+
+OPERATORS = ("and", "or")
+
+class QuerySyntaxError(ValueError):
+    """查询语句不符合语法"""
+
+class Mention(NamedTuple):
+    entity_type: Optional[str]
+    entity_name: str
+
+class And(NamedTuple):
+    children: Tuple["Node", ...]
+
+class Or(NamedTuple):
+    children: Tuple["Node", ...]
+
+Node = Union[Mention, And, Or]
+
+class PaperQuery(NamedTuple):
+    limit: Optional[int]
+    condition: Node
+
+class MentionShape(NamedTuple):
+    """单个条件的查询结构：实体类型及是否使用 trigram 索引"""
+    entity_type: Optional[str]
+    trigram: bool
+
+def _expect(tokens: List[str], position: int, *words: str) -> int:
+    if position >= len(tokens) or tokens[position] not in words:
+        raise QuerySyntaxError(f"第 {position + 1} 个词应为 '{words[0]}'")
+    return position + 1
+
+def _parse_mention(tokens: List[str], position: int) -> Tuple[Mention, int]:
+    entity_type = ENTITY_TYPES.get(tokens[position]) if position < len(tokens) else None
+    if entity_type:
+        position += 1
+    words = []
+    while position < len(tokens) and tokens[position] not in OPERATORS:
+        words.append(tokens[position])
+        position += 1
+    if not words:
+        raise QuerySyntaxError(f"第 {position + 1} 个词处缺少实体名称")
+    return Mention(entity_type, normalize_name(" ".join(words))), position
+
+def _parse_and(tokens: List[str], position: int) -> Tuple[Node, int]:
+    children = []
+    mention, position = _parse_mention(tokens, position)
+    children.append(mention)
+    while position < len(tokens) and tokens[position] == "and":
+        mention, position = _parse_mention(tokens, position + 1)
+        children.append(mention)
+    return (children[0] if len(children) == 1 else And(tuple(children))), position
+
+def _parse_or(tokens: List[str], position: int) -> Tuple[Node, int]:
+    children = []
+    node, position = _parse_and(tokens, position)
+    children.append(node)
+    while position < len(tokens) and tokens[position] == "or":
+        node, position = _parse_and(tokens, position + 1)
+        children.append(node)
+    return (children[0] if len(children) == 1 else Or(tuple(children))), position
+
+def parse(query: str) -> PaperQuery:
+    """把查询语句解析为语法树"""
+    tokens = query.lower().split()
+    position = _expect(tokens, 0, "get")
+    limit = None
+    if position < len(tokens) and tokens[position] in ("one", "all"):
+        limit = 1 if tokens[position] == "one" else None
+        position += 1
+    position = _expect(tokens, position, "papers", "paper")
+    position = _expect(tokens, position, "that")
+    position = _expect(tokens, position, "mention", "mentions")
+    condition, position = _parse_or(tokens, position)
+    return PaperQuery(limit, condition)
+
+def _use_trigram(name: str, dialect: str) -> bool:
+    # trigram 索引要求查询至少 3 个字符
+    return dialect == "sqlite" and len(name) >= 3
+
+def _shape(node: Node, dialect: str):
+    """查询结构：去掉实体名称后的语法树，作为编译缓存的键"""
+    if isinstance(node, Mention):
+        return MentionShape(node.entity_type, _use_trigram(node.entity_name, dialect))
+    return (type(node).__name__, tuple(_shape(child, dialect) for child in node.children))
+
+def _pattern(name: str, dialect: str) -> str:
+    """子串匹配的绑定参数：trigram 查询为 FTS5 短语，否则为转义后的 LIKE 模式"""
+    if _use_trigram(name, dialect):
+        return '"' + name.replace('"', '""') + '"'
+    return like_pattern(name)
+
+def _mentions(node: Node) -> List[Mention]:
+    if isinstance(node, Mention):
+        return [node]
+    return [mention for child in node.children for mention in _mentions(child)]
+
+def _compile_node(shape, counter: List[int]) -> str:
+    if isinstance(shape, MentionShape):
+        index = counter[0]
+        counter[0] += 1
+        if shape.trigram:
+            condition = (
+                f"e.entity_id IN (SELECT rowid FROM {TRIGRAM_TABLE} "
+                f"WHERE {TRIGRAM_TABLE} MATCH :name_{index})"
+            )
+        else:
+            condition = f"e.entity_norm LIKE :name_{index} ESCAPE '\\'"
+        sql = (
+            f"SELECT pe.paper_id FROM papers_have_entities AS pe "
+            f"JOIN entities AS e ON e.entity_id = pe.entity_id "
+            f"WHERE {condition}"
+        )
+        if shape.entity_type is not None:
+            sql += f" AND e.entity_type = :entity_type_{index}"
+        return sql
+
+    operator, children = shape
+    parts = []
+    for child in children:
+        sql = _compile_node(child, counter)
+        if not isinstance(child, MentionShape):
+            # SQLite 不允许复合查询的操作数带括号，子表达式包装为派生表
+            sql = f"SELECT paper_id FROM ({sql}) AS q{counter[0]}_{len(parts)}"
+        parts.append(sql)
+    return (" INTERSECT " if operator == "And" else " UNION ").join(parts)
+
+@lru_cache(maxsize=256)
+def _compile(shape, limit: Optional[int]):
+    condition = _compile_node(shape, [0])
+    sql = f"SELECT papers.* FROM papers WHERE papers.paper_id IN ({condition}) ORDER BY papers.paper_id"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return text(sql)
+
+def compile_query(query: PaperQuery, dialect: str = "sqlite"):
+    """编译为 (SQL语句, 绑定参数)，dialect 为数据库方言名称"""
+    params: Dict[str, str] = {}
+    for i, mention in enumerate(_mentions(query.condition)):
+        params[f"name_{i}"] = _pattern(mention.entity_name, dialect)
+        if mention.entity_type is not None:
+            params[f"entity_type_{i}"] = mention.entity_type
+    return _compile(_shape(query.condition, dialect), query.limit), params
+
+def search_papers(db: Session, query: str) -> List[Paper]:
+    """执行查询语句，返回匹配的论文"""
+    statement, params = compile_query(parse(query), db.bind.dialect.name)
+    return db.query(Paper).from_statement(statement).params(**params).all()
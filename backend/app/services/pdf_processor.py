@@ -1,101 +1,202 @@
 import os
 import json
-import spacy
-from pdf2docx import parse
-import docx
-from simplify_docx import simplify
+from app.core import metrics
 from app.core.config import settings
 from app.schemas.entity import EntityCreate
-from app.services import crud
+from app.services import crud, document_store, mention_codec, page_parallel, storage
+from app.services.nlp import get_nlp
 from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, List, Optional
 
-# 使用较小的英语模型
-nlp = spacy.load("en_core_web_sm")
+# pdf2docx、PyMuPDF、python-docx 等依赖导入较慢，只在实际处理文档时于函数内导入
 
-async def process_pdf(file_path: str, db: Session):
-    """处理PDF文件并提取实体"""
-    try:
-        # 创建必要的目录
-        os.makedirs("papers", exist_ok=True)
-        os.makedirs("docs", exist_ok=True)
-        os.makedirs("json", exist_ok=True)
-        os.makedirs("ents", exist_ok=True)
-        
-        # 准备文件路径
-        base_name = os.path.splitext(os.path.basename(file_path))[0]
-        docx_path = os.path.join("docs", f"{base_name}.docx")
-        json_path = os.path.join("json", f"{base_name}.json")
-        ents_path = os.path.join("ents", f"{base_name}.json")
-        
-        # 转换PDF到DOCX
-        parse(file_path, docx_path)
-        
-        # 读取DOCX文件
-        doc = docx.Document(docx_path)
-        
-        # 保存简化的JSON
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(simplify(doc, {"special-characters-as-text": False}), f)
-        
-        # 提取文本
-        full_text = []
-        for para in doc.paragraphs:
-            if para.text.strip():  # 只处理非空段落
-                full_text.append(para.text)
-        
-        # 实体识别
-        full_doc = nlp(''.join(full_text))
-        entities = {"entities": []}
-        
-        # 保存实体信息
-        for ent in full_doc.ents:
-            entity_info = {
+def _iter_chunks(paragraphs: List[str], max_length: int):
+    """按段落切分全文，生成 (在全文中的起始偏移, 文本)；超长段落再按 max_length 切分"""
+    offset = 0
+    for paragraph in paragraphs:
+        for start in range(0, len(paragraph), max_length):
+            yield offset + start, paragraph[start:start + max_length]
+        offset += len(paragraph)
+
+def recognize_entities(paragraphs: List[str]) -> List[Dict[str, Any]]:
+    """
+    用 nlp.pipe 按段落批量识别实体
+    偏移量相对于 ''.join(paragraphs) 得到的全文
+    """
+    nlp = get_nlp()
+    chunks = list(_iter_chunks(paragraphs, nlp.max_length))
+    docs = nlp.pipe(
+        (text for _, text in chunks),
+        batch_size=settings.NER_BATCH_SIZE,
+        n_process=settings.NER_N_PROCESS
+    )
+    entities = []
+    for (offset, _), doc in zip(chunks, docs):
+        for ent in doc.ents:
+            entities.append({
                 "text": ent.text,
-                "start_char": ent.start_char,
-                "end_char": ent.end_char,
+                "start_char": offset + ent.start_char,
+                "end_char": offset + ent.end_char,
                 "label": ent.label_
-            }
-            entities["entities"].append(entity_info)
+            })
+    return entities
+
+def extract_paragraphs(pdf_path: str) -> List[str]:
+    """直接从PDF按文本块提取段落，不经过DOCX转换；大型文档按页并行提取"""
+    return page_parallel.extract_paragraphs(pdf_path)
+
+def extract_docx_paragraphs(doc) -> List[str]:
+    """从DOCX文档中提取非空段落"""
+    return [para.text for para in doc.paragraphs if para.text.strip()]
+
+def write_simplified_json(doc, json_path: str) -> None:
+    """简化DOCX文档并按块写为 NDJSON 及偏移索引（见 document_store）"""
+    from simplify_docx import simplify
+
+    document_store.write_document(simplify(doc, {"special-characters-as-text": False}), json_path)
+
+def ensure_docx(pdf_path: str, docx_path: str) -> str:
+    """按需生成论文的DOCX文件，返回其路径
+
+    转换为CPU密集型操作，应在后台进程池中调用（见 jobs.run_exclusive）
+    """
+    if not os.path.exists(docx_path):
+        os.makedirs(os.path.dirname(docx_path) or ".", exist_ok=True)
+        page_parallel.convert_to_docx(pdf_path, docx_path)
+    return docx_path
+
+def ensure_json(pdf_path: str, docx_path: str, paper_json: str) -> str:
+    """按需生成论文的分段简化文档，返回其 NDJSON 路径（同样应在后台进程池中调用）"""
+    path = document_store.content_path(paper_json)
+    if not document_store.exists(path):
+        if path != paper_json and os.path.exists(paper_json):
+            # 旧版整体保存的简化JSON，转换一次
+            document_store.convert_legacy(paper_json, path)
+        else:
+            import docx
+
+            doc = docx.Document(ensure_docx(pdf_path, docx_path))
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            write_simplified_json(doc, path)
+    return path
+
+def load_paragraphs(content_hash: str) -> Optional[List[str]]:
+    """
+    读取缓存的段落文本（实体识别所用的文本），不存在时返回 None
+    mentions 中的 start_char/end_char 是这些段落直接拼接（''.join）后的全文偏移
+    """
+    text_path = storage.artifact_path(content_hash, "text")
+    if not os.path.exists(text_path):
+        return None
+    with open(text_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def analyze_pdf(
+    file_path: str,
+    content_hash: Optional[str] = None,
+    paper_name: Optional[str] = None,
+    progress: Optional[Callable[[str, int], None]] = None
+) -> Dict[str, Any]:
+    """提取PDF文本并识别实体，不访问数据库
+
+    返回 {"paper": 论文记录字段, "entities": 实体识别结果列表, "paragraphs": 段落文本}，
+    可交给 crud.ingest_paper 写入数据库。
+    content_hash 为PDF内容的 SHA-256，为空时由文件计算；paper_name 默认取文件名。
+    settings.EXTRACTION_MODE 为 "pdf" 时直接从PDF提取文本，DOCX 和简化JSON
+    在首次请求时才生成；为 "docx" 时沿用 PDF→DOCX→JSON 的完整转换流程。
+    """
+    def report(stage: str, percent: int) -> None:
+        if progress is not None:
+            progress(stage, percent)
+
+    # 产物按PDF内容哈希存放，相同内容的处理结果可直接复用
+    if paper_name is None:
+        paper_name = os.path.splitext(os.path.basename(file_path))[0]
+    if content_hash is None:
+        content_hash = storage.hash_file(file_path)
+    docx_path = storage.artifact_path(content_hash, "docx")
+    json_path = storage.artifact_path(content_hash, "json")
+    ents_path = storage.artifact_path(content_hash, "ents")
+    text_path = storage.artifact_path(content_hash, "text")
+
+    os.makedirs(storage.artifact_dir(content_hash), exist_ok=True)
+    
+    if os.path.exists(ents_path) and os.path.exists(text_path):
+        # 已有缓存的段落文本和实体识别结果
+        report("cached", 55)
+        with metrics.stage_timer("cache_load"):
+            full_text = load_paragraphs(content_hash)
+            entities = mention_codec.read(ents_path, "".join(full_text))
+    else:
+        if settings.EXTRACTION_MODE == "docx":
+            # 转换PDF到DOCX
+            report("convert", 5)
+            import docx
+
+            if not os.path.exists(docx_path):
+                with metrics.stage_timer("convert"):
+                    page_parallel.convert_to_docx(file_path, docx_path)
+            
+            # 读取DOCX文件并保存简化的JSON
+            report("simplify", 40)
+            with metrics.stage_timer("docx_load"):
+                doc = docx.Document(docx_path)
+            if not document_store.exists(json_path):
+                with metrics.stage_timer("simplify"):
+                    write_simplified_json(doc, json_path)
+            with metrics.stage_timer("text_join"):
+                full_text = extract_docx_paragraphs(doc)
+        else:
+            # 直接从PDF提取文本
+            report("extract", 5)
+            with metrics.stage_timer("extract"):
+                full_text = extract_paragraphs(file_path)
         
-        with open(ents_path, 'w', encoding='utf-8') as f:
-            json.dump(entities, f)
+        # 实体识别
+        report("ner", 55)
+        with metrics.stage_timer("ner"):
+            entities = recognize_entities(full_text)
         
-        # 创建论文记录
-        paper_data = {
-            "paper_name": base_name,
+        with metrics.stage_timer("cache_write"):
+            storage.write_atomic(text_path, json.dumps(full_text))
+            mention_codec.write(ents_path, entities)
+    
+    return {
+        "paper": {
+            "paper_name": paper_name,
             "paper_pdf": file_path,
             "paper_docx": docx_path,
             "paper_json": json_path,
-            "paper_entities": ents_path
-        }
-        paper = crud.create_paper(db, paper_data)
-        
-        # 处理实体
-        entity_counts = {}  # 用于统计每个实体的出现次数
-        for ent in entities["entities"]:
-            entity_data = {
-                "entity_name": ent["text"],
-                "entity_type": ent["label"]
-            }
-            # 创建或获取实体
-            entity = crud.create_entity(db, entity_data)
-            
-            # 更新实体计数
-            key = (entity.entity_id, paper.paper_id)
-            entity_counts[key] = entity_counts.get(key, 0) + 1
-        
-        # 批量更新实体关系和计数
-        for (entity_id, paper_id), count in entity_counts.items():
-            crud.add_paper_entity(db, paper_id, entity_id, count)
+            "paper_entities": ents_path,
+            "content_hash": content_hash
+        },
+        "entities": entities,
+        "paragraphs": full_text
+    }
+
+def process_pdf(
+    file_path: str,
+    db: Session,
+    content_hash: Optional[str] = None,
+    paper_name: Optional[str] = None,
+    progress: Optional[Callable[[str, int], None]] = None
+):
+    """处理PDF文件并提取实体
+
+    该函数为CPU密集型的同步流程，应在后台工作进程中调用（见 app.services.jobs）。
+    progress 回调接收 (阶段名称, 进度百分比)。
+    """
+    try:
+        result = analyze_pdf(
+            file_path, content_hash=content_hash, paper_name=paper_name, progress=progress
+        )
         
-        return paper
+        # 在单个事务中写入论文、实体及关系
+        if progress is not None:
+            progress("store", 85)
+        with metrics.stage_timer("store"):
+            return crud.ingest_paper(db, result["paper"], result["entities"], result["paragraphs"])
         
     except Exception as e:
-        # 清理临时文件
-        for path in [docx_path, json_path, ents_path]:
-            if os.path.exists(path):
-                try:
-                    os.remove(path)
-                except:
-                    pass
-        raise Exception(f"处理PDF文件失败: {str(e)}") 
\ No newline at end of file
+        # 已缓存的产物按内容寻址，处理失败时保留以便重试复用
+        raise Exception(f"处理PDF文件失败: {str(e)}")
@@ -0,0 +1,146 @@
+"""
+读接口的响应缓存
+
+缓存键和 ETag 由 (接口名, 语料版本号, 查询参数) 决定。语料版本号是 corpus_state
+中的计数器，导入和删除论文时随事件一起递增（见 crud.record_corpus_events），
+读取只需一行；旧版本的缓存随之失效，不需要主动清除。命中 If-None-Match 时直接返回 304。
+
+默认使用进程内 LRU（带过期时间）；设置 CACHE_URL=redis://... 时改用 Redis，
+多个 API 进程可以共享缓存（需要安装 redis 包）。
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+class LocalCache:
+    """进程内的 LRU 缓存，条目在 ttl 秒后过期"""
+    blocking = False
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class RedisCache:
+    """Redis（或兼容协议的存储）缓存，过期由 Redis 处理"""
+    blocking = True
+
+    def __init__(self, url: str, ttl: int, prefix: str = "papers-api:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL 指向 Redis 时需要安装 redis 包")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes) -> None:
+        self.client.setex(self.prefix + key, self.ttl, value)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+def create_backend():
+    if settings.CACHE_URL:
+        return RedisCache(settings.CACHE_URL, settings.CACHE_TTL)
+    return LocalCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL)
+
+backend = create_backend()
+
+def make_etag(namespace: str, version: int, params: Dict[str, Any]) -> str:
+    digest = hashlib.sha1(
+        json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:12]
+    return f'"{namespace}-{version}-{digest}"'
+
+def _encode(data: Any) -> bytes:
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False).encode("utf-8")
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+def _response(body: bytes, etag: str) -> Response:
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+async def respond(
+    request: Request,
+    namespace: str,
+    version: int,
+    params: Dict[str, Any],
+    compute: Callable[[], Awaitable[Any]]
+) -> Response:
+    """在异步接口中返回缓存的响应，未命中时调用 compute 计算并写入缓存"""
+    etag = make_etag(namespace, version, params)
+    not_modified = _not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    if backend.blocking:
+        body = await run_in_threadpool(backend.get, etag)
+    else:
+        body = backend.get(etag)
+    if body is None:
+        body = _encode(await compute())
+        if backend.blocking:
+            await run_in_threadpool(backend.set, etag, body)
+        else:
+            backend.set(etag, body)
+    return _response(body, etag)
+
+def respond_sync(
+    request: Request,
+    namespace: str,
+    version: int,
+    params: Dict[str, Any],
+    compute: Callable[[], Any]
+) -> Response:
+    """respond 的同步版本，供在线程池中执行的接口使用"""
+    etag = make_etag(namespace, version, params)
+    not_modified = _not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    body = backend.get(etag)
+    if body is None:
+        body = _encode(compute())
+        backend.set(etag, body)
+    return _response(body, etag)
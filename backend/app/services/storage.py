@@ -0,0 +1,90 @@
+import hashlib
+import os
+import tempfile
+import uuid
+from typing import Tuple
+
+import aiofiles
+
+from app.core.config import settings
+
+# 按内容哈希缓存的处理产物文件名
+ARTIFACT_NAMES = {
+    "docx": "paper.docx",
+    "json": "simplified.ndjson",
+    "ents": "mentions.bin",
+    "text": "paragraphs.json",
+    "pdf": "source.pdf",
+}
+
+# 计算哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def hash_bytes(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+def hash_file(file_path: str) -> str:
+    """分块计算文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def artifact_dir(content_hash: str) -> str:
+    """内容寻址目录：store/<哈希前两位>/<哈希>"""
+    return os.path.join(settings.STORE_DIR, content_hash[:2], content_hash)
+
+def artifact_path(content_hash: str, kind: str) -> str:
+    return os.path.join(artifact_dir(content_hash), ARTIFACT_NAMES[kind])
+
+def write_atomic(path: str, data) -> None:
+    """
+    先写同目录下的临时文件再改名，并发读取的一方不会读到不完整的文件
+    data 为 bytes 或 str；临时文件名唯一，多个线程同时写同一路径也不会互相覆盖
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        if isinstance(data, str):
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+        else:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+class UploadTooLargeError(Exception):
+    """上传文件超过 settings.MAX_UPLOAD_SIZE"""
+
+async def save_upload(upload, directory: str) -> Tuple[str, str]:
+    """
+    将上传文件分块写入 directory 下的临时文件，同时计算 SHA-256
+    超过大小上限时立即停止读取并删除临时文件；返回 (临时文件路径, 内容哈希)
+
+    upload 为 Starlette 的 UploadFile，请求体此时已由表单解析缓存到临时文件，
+    这里是第二次写入；请求大小的上限由 main.limit_upload_size 在读取请求体之前检查，
+    这里的检查只作为兜底
+    """
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".upload-{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            while True:
+                chunk = await upload.read(settings.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > settings.MAX_UPLOAD_SIZE:
+                    raise UploadTooLargeError(f"文件超过大小上限 {settings.MAX_UPLOAD_SIZE} 字节")
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest()
@@ -0,0 +1,112 @@
+"""
+实体名称自动补全
+
+在内存中维护按规范化名称排序的 (entity_norm, entity_id) 列表，
+前缀查询用二分定位范围，再按出现论文数取前 N 个。
+数据来自 KnowledgeGraph，图同步语料变化时按涉及的实体增量更新。
+"""
+import bisect
+import heapq
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.services.entity_search import MAX_CHAR, normalize_name
+from app.services.graph import KnowledgeGraph, knowledge_graph
+
+# 匹配范围超过该数量的前缀缓存其排名结果（数据变化时清空）
+_CACHE_MIN_CANDIDATES = 256
+_CACHE_SIZE = 1024
+
+class EntitySuggester:
+    def __init__(self, graph: KnowledgeGraph):
+        self.graph = graph
+        # entity_id -> (entity_norm, entity_name, entity_type, paper_count)
+        self.entries: Dict[int, Tuple[str, str, str, int]] = {}
+        self.keys: List[Tuple[str, int]] = []
+        self._cache: Dict[Tuple[str, Optional[str], int], List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        graph.add_listener(self._on_change)
+
+    def _entry(self, entity_id: int) -> Optional[Tuple[str, str, str, int]]:
+        papers = self.graph.entity_edges.get(entity_id)
+        node = self.graph.entities.get(entity_id)
+        if not papers or node is None:
+            return None
+        entity_name, entity_type = node
+        return normalize_name(entity_name), entity_name, entity_type, len(papers)
+
+    def _on_change(self, entity_ids: Optional[Set[int]]) -> None:
+        """图变化回调（在图锁内调用），entity_ids 为 None 时全量重建"""
+        with self._lock:
+            if entity_ids is None:
+                self._cache.clear()
+                self.entries = {}
+                for entity_id in self.graph.entities:
+                    entry = self._entry(entity_id)
+                    if entry is not None:
+                        self.entries[entity_id] = entry
+                self.keys = sorted((entry[0], entity_id) for entity_id, entry in self.entries.items())
+                return
+
+            changed = set()
+            for entity_id in entity_ids:
+                old = self.entries.pop(entity_id, None)
+                if old is not None:
+                    changed.add(old[0])
+                    index = bisect.bisect_left(self.keys, (old[0], entity_id))
+                    if index < len(self.keys) and self.keys[index] == (old[0], entity_id):
+                        del self.keys[index]
+                entry = self._entry(entity_id)
+                if entry is not None:
+                    changed.add(entry[0])
+                    self.entries[entity_id] = entry
+                    bisect.insort(self.keys, (entry[0], entity_id))
+
+            # 只丢弃前缀覆盖了变化实体的缓存结果
+            self._cache = {
+                key: results for key, results in self._cache.items()
+                if not any(norm.startswith(key[0]) for norm in changed)
+            }
+
+    def suggest(
+        self,
+        prefix: str,
+        limit: int = 10,
+        entity_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """返回名称以 prefix 开头的实体，按出现的论文数降序"""
+        norm = normalize_name(prefix)
+        cache_key = (norm, entity_type, limit)
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            low = bisect.bisect_left(self.keys, (norm,))
+            high = bisect.bisect_left(self.keys, (norm + MAX_CHAR,), low)
+            candidates = (entity_id for _, entity_id in self.keys[low:high])
+            if entity_type:
+                candidates = (
+                    entity_id for entity_id in candidates
+                    if self.entries[entity_id][2] == entity_type
+                )
+            top = heapq.nlargest(
+                limit, candidates,
+                key=lambda entity_id: (self.entries[entity_id][3], -entity_id)
+            )
+            results = [
+                {
+                    "entity_id": entity_id,
+                    "entity_name": self.entries[entity_id][1],
+                    "entity_type": self.entries[entity_id][2],
+                    "paper_count": self.entries[entity_id][3]
+                }
+                for entity_id in top
+            ]
+            if high - low >= _CACHE_MIN_CANDIDATES:
+                if len(self._cache) >= _CACHE_SIZE:
+                    self._cache.pop(next(iter(self._cache)))
+                self._cache[cache_key] = results
+            return results
+
+entity_suggester = EntitySuggester(knowledge_graph)
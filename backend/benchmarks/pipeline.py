@@ -0,0 +1,328 @@
+"""
+论文处理流程的分阶段基准测试
+
+用法（在 backend 目录下）：
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline papers/ --scale 10 --output bench.json
+    python -m benchmarks.pipeline --stages extract,ner,db_upsert --repeat 3
+
+对 papers/ 中的每个PDF分别执行各阶段，统计每个阶段的墙钟时间、CPU时间、
+峰值内存（RSS）和吞吐量，结果以 JSON 输出，便于在不同提交之间对比。
+
+阶段：
+    extract     PyMuPDF 直接提取段落（EXTRACTION_MODE=pdf 时使用）
+    convert     pdf2docx 转换（PDF→DOCX，大型文档按页并行）
+    docx_load   docx.Document 读取DOCX
+    simplify    simplify_docx 简化文档
+    text_join   提取DOCX段落并拼接全文
+    ner         spaCy 实体识别（nlp.pipe）
+    db_upsert   crud.ingest_paper 写入临时 SQLite 数据库
+
+--scale N 为每篇论文生成 N 份合成副本（名称不同，部分实体名称带副本序号），
+text_join、ner、db_upsert 在放大后的语料上运行；基于文件的阶段只处理原始PDF。
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+STAGES = ["extract", "convert", "docx_load", "simplify", "text_join", "ner", "db_upsert"]
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def _current_rss() -> Optional[int]:
+    """当前进程的常驻内存（字节），仅 Linux 可用"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class _RssSampler(threading.Thread):
+    """在阶段执行期间定期采样 RSS，得到该阶段的峰值"""
+
+    def __init__(self, interval: float = 0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = _current_rss()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            rss = _current_rss()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def stop(self) -> Optional[int]:
+        self._stopped.set()
+        self.join()
+        rss = _current_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+        return self.peak
+
+def _cpu_time() -> float:
+    """本进程及已结束子进程的 CPU 时间（pdf2docx、nlp.pipe 可能使用子进程）"""
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+def measure(
+    stage: str,
+    items: List[Any],
+    run: Callable[[Any], Any],
+    size: Callable[[Any], int] = lambda item: 0
+) -> Dict[str, Any]:
+    """对每个 item 执行 run，返回该阶段的统计结果"""
+    sampler = _RssSampler()
+    sampler.start()
+    started_cpu = _cpu_time()
+    started = time.perf_counter()
+    units = 0
+    for item in items:
+        run(item)
+        units += size(item)
+    wall = time.perf_counter() - started
+    cpu = _cpu_time() - started_cpu
+    peak = sampler.stop()
+
+    result = {
+        "items": len(items),
+        "wall_seconds": round(wall, 4),
+        "cpu_seconds": round(cpu, 4),
+        "peak_rss_mb": round(peak / 2 ** 20, 1) if peak is not None else None,
+        "items_per_second": round(len(items) / wall, 3) if wall > 0 else None
+    }
+    if units:
+        result["chars"] = units
+        result["chars_per_second"] = round(units / wall, 1) if wall > 0 else None
+    print(f"{stage:<10} {len(items):>5} items  {wall:8.3f}s wall  {cpu:8.3f}s cpu  "
+          f"{result['peak_rss_mb']} MB", file=sys.stderr)
+    return result
+
+def synthesize(papers: List[Dict[str, Any]], scale: int) -> List[Dict[str, Any]]:
+    """
+    为每篇论文生成 scale 份副本：论文名加序号，约一半的实体名称加序号，
+    使实体表按副本数增长，同时保留跨论文共享的实体
+    """
+    corpus = []
+    for copy in range(scale):
+        for paper in papers:
+            entities = []
+            for i, ent in enumerate(paper["entities"]):
+                if copy and i % 2:
+                    ent = dict(ent, text=f"{ent['text']} {copy}")
+                entities.append(ent)
+            corpus.append({
+                "name": paper["name"] if copy == 0 else f"{paper['name']}-{copy}",
+                "paragraphs": paper["paragraphs"],
+                "entities": entities
+            })
+    return corpus
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(
+    pdf_paths: List[str],
+    stages: List[str],
+    scale: int = 1,
+    repeat: int = 1
+) -> Dict[str, Any]:
+    from app.core.config import settings
+    from app.services import pdf_processor
+
+    workdir = tempfile.mkdtemp(prefix="pipeline-bench-")
+    results: Dict[str, List[Dict[str, Any]]] = {stage: [] for stage in stages}
+    names = [os.path.splitext(os.path.basename(path))[0] for path in pdf_paths]
+    docx_paths = [os.path.join(workdir, f"{name}.docx") for name in names]
+
+    def docx_needed() -> None:
+        # 依赖DOCX的阶段在未运行 convert 时先生成DOCX（不计时）
+        from app.services.page_parallel import convert_to_docx
+        for pdf_path, docx_path in zip(pdf_paths, docx_paths):
+            if not os.path.exists(docx_path):
+                convert_to_docx(pdf_path, docx_path)
+
+    for _ in range(repeat):
+        if "extract" in stages:
+            results["extract"].append(measure("extract", pdf_paths, pdf_processor.extract_paragraphs))
+
+        if "convert" in stages:
+            from app.services.page_parallel import convert_to_docx
+            results["convert"].append(measure(
+                "convert", list(zip(pdf_paths, docx_paths)), lambda item: convert_to_docx(*item)
+            ))
+
+        docs = []
+        if {"docx_load", "simplify", "text_join"} & set(stages):
+            docx_needed()
+            import docx
+            if "docx_load" in stages:
+                results["docx_load"].append(measure(
+                    "docx_load", docx_paths, lambda path: docs.append(docx.Document(path))
+                ))
+            else:
+                docs = [docx.Document(path) for path in docx_paths]
+
+        if "simplify" in stages:
+            from simplify_docx import simplify
+            results["simplify"].append(measure(
+                "simplify", docs, lambda doc: simplify(doc, {"special-characters-as-text": False})
+            ))
+
+        # 放大后的语料：以直接从PDF提取的段落为基础
+        paragraphs = [pdf_processor.extract_paragraphs(path) for path in pdf_paths]
+        papers = [
+            {"name": name, "paragraphs": text, "entities": []}
+            for name, text in zip(names, paragraphs)
+        ]
+
+        if "text_join" in stages:
+            scaled_docs = docs * scale
+            results["text_join"].append(measure(
+                "text_join",
+                scaled_docs,
+                lambda doc: "".join(pdf_processor.extract_docx_paragraphs(doc))
+            ))
+
+        if {"ner", "db_upsert"} & set(stages):
+            # 模型加载单独计时，不计入 ner 阶段
+            from app.services.nlp import get_nlp
+            loaded = time.perf_counter()
+            get_nlp()
+            model_load = time.perf_counter() - loaded
+
+            if "ner" in stages:
+                corpus = synthesize(papers, scale)
+                ner_result = measure(
+                    "ner",
+                    corpus,
+                    lambda paper: pdf_processor.recognize_entities(paper["paragraphs"]),
+                    size=lambda paper: sum(len(p) for p in paper["paragraphs"])
+                )
+                ner_result["model_load_seconds"] = round(model_load, 4)
+                results["ner"].append(ner_result)
+
+            if "db_upsert" in stages:
+                for paper in papers:
+                    paper["entities"] = pdf_processor.recognize_entities(paper["paragraphs"])
+
+        if "db_upsert" in stages:
+            results["db_upsert"].append(_measure_db_upsert(workdir, synthesize(papers, scale)))
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "papers": [os.path.basename(path) for path in pdf_paths],
+            "scale": scale,
+            "repeat": repeat,
+            "settings": {
+                "SPACY_MODEL": settings.SPACY_MODEL,
+                "EXTRACTION_MODE": settings.EXTRACTION_MODE,
+                "PAGE_PARALLEL_THRESHOLD": settings.PAGE_PARALLEL_THRESHOLD,
+                "PAGE_WORKERS": settings.PAGE_WORKERS,
+                "NER_BATCH_SIZE": settings.NER_BATCH_SIZE,
+                "NER_N_PROCESS": settings.NER_N_PROCESS
+            }
+        },
+        "stages": {stage: _summarize(runs) for stage, runs in results.items()}
+    }
+
+def _measure_db_upsert(workdir: str, corpus: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """在新建的临时 SQLite 数据库上逐篇写入"""
+    from sqlalchemy.orm import sessionmaker
+
+    from app.db.base_class import Base
+    from app.db.session import create_db_engine
+    from app.models import models  # noqa: F401 注册所有模型
+    from app.services import crud, entity_search, fulltext
+
+    db_path = os.path.join(workdir, f"bench-{time.time_ns()}.db")
+    engine = create_db_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    fulltext.create_index(engine)
+    entity_search.create_index(engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+    def upsert(paper: Dict[str, Any]) -> None:
+        crud.ingest_paper(db, {
+            "paper_name": paper["name"],
+            "paper_pdf": f"{paper['name']}.pdf",
+            "paper_docx": f"{paper['name']}.docx",
+            "paper_json": f"{paper['name']}.ndjson",
+            "paper_entities": f"{paper['name']}.bin"
+        }, paper["entities"], paper["paragraphs"])
+
+    try:
+        result = measure("db_upsert", corpus, upsert)
+        result["mentions"] = sum(len(paper["entities"]) for paper in corpus)
+    finally:
+        db.close()
+        engine.dispose()
+    return result
+
+def _summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """多次运行时取墙钟时间的中位数所在的那次，并附上所有运行结果"""
+    if not runs:
+        return {}
+    ordered = sorted(runs, key=lambda run: run["wall_seconds"])
+    summary = dict(ordered[len(ordered) // 2])
+    if len(runs) > 1:
+        summary["runs"] = runs
+    return summary
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="论文处理流程分阶段基准测试")
+    parser.add_argument("source", nargs="?", default="papers", help="PDF目录")
+    parser.add_argument("--stages", default=",".join(STAGES), help="逗号分隔的阶段列表")
+    parser.add_argument("--scale", type=int, default=1, help="合成语料的放大倍数")
+    parser.add_argument("--repeat", type=int, default=1, help="重复次数（报告中位数）")
+    parser.add_argument("--output", help="结果JSON文件，缺省时输出到标准输出")
+    args = parser.parse_args(argv)
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"未知的阶段: {', '.join(sorted(unknown))}")
+    pdf_paths = sorted(
+        os.path.join(args.source, name) for name in os.listdir(args.source)
+        if name.lower().endswith(".pdf")
+    )
+    if not pdf_paths:
+        parser.error(f"{args.source} 中没有PDF文件")
+
+    # 各依赖库的日志输出到标准错误，标准输出只保留结果JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_benchmark(pdf_paths, stages, scale=max(args.scale, 1), repeat=max(args.repeat, 1))
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
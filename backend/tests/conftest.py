@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base_class import Base
+from app.db.session import create_db_engine
+from app.models import models  # noqa: F401 确保所有模型已注册到 Base.metadata
+from app.services import entity_search, fulltext
+
+@pytest.fixture
+def db():
+    """每个测试使用独立的内存 SQLite 数据库"""
+    engine = create_db_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    fulltext.create_index(engine)
+    entity_search.create_index(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+@pytest.fixture
+def make_paper():
+    """构造 crud.ingest_paper 所需的论文字段"""
+    def make(name: str, content_hash=None):
+        return {
+            "paper_name": name,
+            "paper_pdf": f"{name}.pdf",
+            "paper_docx": f"{name}.docx",
+            "paper_json": f"{name}.ndjson",
+            "paper_entities": f"{name}.bin",
+            "content_hash": content_hash
+        }
+    return make
@@ -0,0 +1,43 @@
+import json
+
+from app.services import document_store
+
+def _document(blocks):
+    return {"TYPE": "document", "VALUE": [{"TYPE": "body", "VALUE": blocks}]}
+
+def _paragraph(*texts):
+    return {"TYPE": "paragraph", "VALUE": [{"TYPE": "text", "VALUE": text} for text in texts]}
+
+BLOCKS = [
+    _paragraph("Hello ", "world"),
+    {"TYPE": "table", "VALUE": [{"TYPE": "table-row", "VALUE": [
+        {"TYPE": "table-cell", "VALUE": [_paragraph("中文")]},
+        {"TYPE": "table-cell", "VALUE": [_paragraph("cell")]}
+    ]}]},
+    _paragraph("")
+] + [_paragraph(f"block {i}") for i in range(10)]
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "simplified.ndjson")
+    document_store.write_document(_document(BLOCKS), path)
+    assert document_store.exists(path)
+    assert document_store.block_count(path) == len(BLOCKS)
+    assert document_store.read_blocks(path, 0, len(BLOCKS)) == BLOCKS
+    assert document_store.read_blocks(path, 2, 5) == BLOCKS[2:5]
+    assert document_store.read_blocks(path, 10, 100) == BLOCKS[10:]
+    assert document_store.read_blocks(path, 50, 60) == []
+    streamed = b"".join(document_store.iter_document_json(path, chunk_lines=4))
+    assert json.loads(streamed) == _document(BLOCKS)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["simplified.idx", "simplified.ndjson"]
+
+def test_converts_legacy_json(tmp_path):
+    legacy = tmp_path / "simplified.json"
+    legacy.write_text(json.dumps(_document(BLOCKS)), encoding="utf-8")
+    path = document_store.content_path(str(legacy))
+    document_store.convert_legacy(str(legacy), path)
+    assert document_store.read_blocks(path, 0, len(BLOCKS)) == BLOCKS
+
+def test_block_text():
+    assert document_store.block_text(BLOCKS[0]) == "Hello world"
+    assert document_store.block_text(BLOCKS[1]) == "中文 cell"
+    assert document_store.block_text(BLOCKS[2]) == ""
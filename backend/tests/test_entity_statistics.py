@@ -0,0 +1,120 @@
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from app.models.models import Entity, EntityTypeStat
+from app.services import crud
+
+def _mention(name, label, start=None):
+    ent = {"text": name, "label": label}
+    if start is not None:
+        ent.update(start_char=start, end_char=start + len(name))
+    return ent
+
+def _recomputed(db):
+    """由关联表重新聚合的实体计数与按类型汇总"""
+    entities = {
+        entity_id: (paper_count, total)
+        for entity_id, paper_count, total in db.execute(text(
+            "SELECT e.entity_id, COUNT(pe.paper_id), COALESCE(SUM(pe.count), 0) "
+            "FROM entities e LEFT JOIN papers_have_entities pe ON pe.entity_id = e.entity_id "
+            "GROUP BY e.entity_id"
+        ))
+    }
+    types = {
+        entity_type: (count, total)
+        for entity_type, count, total in db.execute(text(
+            "SELECT e.entity_type, COUNT(DISTINCT e.entity_id), SUM(pe.count) "
+            "FROM entities e JOIN papers_have_entities pe ON pe.entity_id = e.entity_id "
+            "GROUP BY e.entity_type"
+        ))
+    }
+    return entities, types
+
+def _maintained(db):
+    """增量维护的实体计数与按类型汇总（计数为 0 的类型视为不存在）"""
+    entities = {
+        entity.entity_id: (entity.paper_count, entity.total_mentions)
+        for entity in db.query(Entity)
+    }
+    types = {
+        stat.entity_type: (stat.entity_count, stat.total_mentions)
+        for stat in db.query(EntityTypeStat)
+        if stat.entity_count or stat.total_mentions
+    }
+    return entities, types
+
+def _ingest_corpus(db, make_paper):
+    crud.ingest_paper(db, make_paper("a"), [
+        _mention("MIT", "ORG", 0),
+        _mention("MIT", "ORG", 10),
+        _mention("Alan Turing", "PERSON", 20)
+    ], ["MIT", "MIT", "Alan Turing"])
+    crud.ingest_paper(db, make_paper("b"), [
+        _mention("MIT", "ORG"),
+        _mention("Hamlet", "WORK_OF_ART")
+    ])
+    crud.ingest_paper(db, make_paper("c"), [
+        _mention("Hamlet", "WORK_OF_ART"),
+        _mention("Hamlet", "WORK_OF_ART"),
+        _mention("Hamlet", "WORK_OF_ART")
+    ])
+
+def test_ingest_matches_group_by(db, make_paper):
+    _ingest_corpus(db, make_paper)
+    assert _maintained(db) == _recomputed(db)
+
+def test_update_entity_statistics_matches_group_by(db, make_paper):
+    _ingest_corpus(db, make_paper)
+    paper = crud.get_paper_by_name(db, "c")
+    hamlet = db.query(Entity).filter(Entity.entity_name == "Hamlet").one()
+    # 手工删除一条关联并按同样的增量更新计数
+    db.execute(text(
+        "DELETE FROM papers_have_entities WHERE paper_id = :paper_id AND entity_id = :entity_id"
+    ), {"paper_id": paper.paper_id, "entity_id": hamlet.entity_id})
+    crud.update_entity_statistics(db, {hamlet.entity_id: (-1, -3)})
+    db.commit()
+    assert _maintained(db) == _recomputed(db)
+
+def test_delete_papers_matches_group_by(db, make_paper):
+    _ingest_corpus(db, make_paper)
+    ids = [crud.get_paper_by_name(db, name).paper_id for name in ("a", "c")]
+    removed = crud.delete_papers(db, ids + [999])
+    assert sorted(paper.paper_id for paper in removed) == sorted(ids)
+    assert _maintained(db) == _recomputed(db)
+    # 只剩论文 b 的实体，不留下孤立实体及其出现位置
+    names = {entity.entity_name for entity in db.query(Entity)}
+    assert names == {"MIT", "Hamlet"}
+    assert db.execute(text(
+        "SELECT COUNT(*) FROM entities e WHERE NOT EXISTS "
+        "(SELECT 1 FROM papers_have_entities pe WHERE pe.entity_id = e.entity_id)"
+    )).scalar() == 0
+    assert db.execute(text("SELECT COUNT(*) FROM mentions")).scalar() == 0
+
+def test_delete_all_papers_clears_type_statistics(db, make_paper):
+    _ingest_corpus(db, make_paper)
+    crud.delete_papers(db, [paper.paper_id for paper in crud.get_papers(db)])
+    assert _maintained(db) == ({}, {})
+
+def test_ingest_same_content_returns_existing_paper(db, make_paper):
+    first = crud.ingest_paper(db, make_paper("a", "hash"), [_mention("MIT", "ORG")])
+    second = crud.ingest_paper(db, make_paper("a-copy", "hash"), [_mention("MIT", "ORG")])
+    assert second.paper_id == first.paper_id
+    assert _maintained(db) == _recomputed(db)
+
+def test_ingest_retries_foreign_key_violation(db, make_paper, monkeypatch):
+    # 模拟 PostgreSQL 上回查到的实体被并发删除后写入关联行时的外键冲突
+    class ForeignKeyViolation(Exception):
+        pgcode = "23503"
+    write_paper = crud._write_paper
+    calls = []
+    def flaky_write_paper(*args):
+        calls.append(1)
+        paper = write_paper(*args)
+        if len(calls) == 1:
+            raise IntegrityError("INSERT INTO papers_have_entities", {}, ForeignKeyViolation())
+        return paper
+    monkeypatch.setattr(crud, "_write_paper", flaky_write_paper)
+    paper = crud.ingest_paper(db, make_paper("a"), [_mention("MIT", "ORG")])
+    assert len(calls) == 2
+    assert [p.paper_id for p in crud.get_papers(db)] == [paper.paper_id]
+    assert _maintained(db) == _recomputed(db)
@@ -0,0 +1,61 @@
+from app.services import crud
+from app.services.graph import KnowledgeGraph
+
+def _entities(*pairs):
+    return [{"text": name, "label": "ORG"} for name, count in pairs for _ in range(count)]
+
+def _reachable(result, center):
+    adjacency = {}
+    for edge in result["edges"]:
+        adjacency.setdefault(edge["source"], []).append(edge["target"])
+        adjacency.setdefault(edge["target"], []).append(edge["source"])
+    reached, frontier = {center}, [center]
+    while frontier:
+        node = frontier.pop()
+        for neighbor in adjacency.get(node, []):
+            if neighbor not in reached:
+                reached.add(neighbor)
+                frontier.append(neighbor)
+    return reached
+
+def test_sync_follows_adds_and_removes(db, make_paper):
+    graph = KnowledgeGraph()
+    a = crud.ingest_paper(db, make_paper("a"), _entities(("X", 1)))
+    graph.sync(db)
+    assert set(graph.papers) == {a.paper_id}
+    b = crud.ingest_paper(db, make_paper("b"), _entities(("X", 2), ("Y", 1)))
+    crud.delete_papers(db, [a.paper_id])
+    graph.sync(db)
+    assert set(graph.papers) == {b.paper_id}
+    assert {name for name, _ in graph.entities.values()} == {"X", "Y"}
+    assert graph.version == crud.get_corpus_version(db)
+
+def test_limited_neighborhood_stays_connected(db, make_paper):
+    # p_a -X(1)- p_b -Y(50)- p_c -Z(60)- ...：权重最大的边离中心最远
+    crud.ingest_paper(db, make_paper("a"), _entities(("X", 1)))
+    crud.ingest_paper(db, make_paper("b"), _entities(("X", 1), ("Y", 50)))
+    crud.ingest_paper(db, make_paper("c"), _entities(("Y", 40), ("Z", 60)))
+    graph = KnowledgeGraph()
+    graph.sync(db)
+    center = f"p{crud.get_paper_by_name(db, 'a').paper_id}"
+
+    result = graph.neighborhood(center, hops=5, limit=2)
+    assert len(result["edges"]) == 2
+    assert {node["id"] for node in result["nodes"]} == _reachable(result, center)
+
+    full = graph.neighborhood(center, hops=5)
+    assert {node["id"] for node in full["nodes"]} == _reachable(full, center)
+    assert len(full["edges"]) == 5
+
+def test_version_counts_events(db, make_paper):
+    assert crud.get_corpus_state(db) == (0, 0)
+    a = crud.ingest_paper(db, make_paper("a"), _entities(("X", 1)))
+    b = crud.ingest_paper(db, make_paper("b"), _entities(("Y", 1)))
+    crud.delete_papers(db, [a.paper_id, b.paper_id])
+    version, last_event_id = crud.get_corpus_state(db)
+    assert version == crud.get_corpus_version(db) == 4
+    assert last_event_id == 4
+    graph = KnowledgeGraph()
+    graph.sync(db)
+    assert (graph.version, graph.last_event_id) == (version, last_event_id)
+    assert graph.snapshot()[0] == '"graph-4"'
@@ -0,0 +1,19 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.models.models import IngestJob
+
+def _add_job(db, status, content_hash):
+    db.add(IngestJob(file_name="a.pdf", file_path="a.pdf", content_hash=content_hash, status=status))
+    db.commit()
+
+def test_one_active_job_per_file_name(db):
+    _add_job(db, "failed", "h1")
+    _add_job(db, "done", "h2")
+    _add_job(db, "pending", "h3")
+    with pytest.raises(IntegrityError):
+        _add_job(db, "pending", "h4")
+    db.rollback()
+    db.query(IngestJob).filter(IngestJob.content_hash == "h3").update({"status": "done"})
+    db.commit()
+    _add_job(db, "running", "h4")
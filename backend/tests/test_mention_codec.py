@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from app.services import mention_codec
+
+TEXT = "MIT hired Alan Turing. Das Café in Zürich."
+
+def _entity(start, end, label):
+    return {"text": TEXT[start:end], "start_char": start, "end_char": end, "label": label}
+
+def test_round_trip(tmp_path):
+    entities = [
+        _entity(0, 3, "ORG"),
+        _entity(10, 21, "PERSON"),
+        _entity(27, 31, "ORG"),
+        _entity(35, 41, "GPE")
+    ]
+    path = str(tmp_path / "mentions.bin")
+    mention_codec.write(path, entities)
+    assert mention_codec.read(path, TEXT) == entities
+    # 只留下目标文件，不残留临时文件
+    assert [p.name for p in tmp_path.iterdir()] == ["mentions.bin"]
+
+def test_empty():
+    assert mention_codec.unpack(mention_codec.pack([]), TEXT) == []
+
+def test_rejects_other_formats():
+    with pytest.raises(ValueError):
+        mention_codec.unpack(json.dumps([]).encode("utf-8"), TEXT)
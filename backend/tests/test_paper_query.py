@@ -0,0 +1,75 @@
+import pytest
+
+from app.services import crud, paper_query
+
+@pytest.fixture
+def corpus(db, make_paper):
+    crud.ingest_paper(db, make_paper("a"), [
+        {"text": "Massachusetts Institute of Technology", "label": "ORG"},
+        {"text": "Alan Turing", "label": "PERSON"}
+    ])
+    crud.ingest_paper(db, make_paper("b"), [
+        {"text": "MIT", "label": "ORG"},
+        {"text": "A_B", "label": "PERSON"}
+    ])
+    crud.ingest_paper(db, make_paper("c"), [
+        {"text": "Turing", "label": "WORK_OF_ART"}
+    ])
+    return db
+
+def _search(db, query):
+    return [paper.paper_name for paper in paper_query.search_papers(db, query)]
+
+def test_parse_precedence():
+    query = paper_query.parse("get all papers that mention person a and b or organisation c")
+    assert query.limit is None
+    assert query.condition == paper_query.Or((
+        paper_query.And((
+            paper_query.Mention("PERSON", "a"),
+            paper_query.Mention(None, "b")
+        )),
+        paper_query.Mention("ORG", "c")
+    ))
+
+@pytest.mark.parametrize("query", [
+    "papers that mention mit",
+    "get papers mention mit",
+    "get papers that mention",
+    "get papers that mention mit and"
+])
+def test_parse_errors(query):
+    with pytest.raises(paper_query.QuerySyntaxError):
+        paper_query.parse(query)
+
+def test_substring_case_insensitive(corpus):
+    assert _search(corpus, "get all papers that mention organisation INSTITUTE") == ["a"]
+    assert _search(corpus, "get papers that mention it") == ["a", "b"]
+
+def test_entity_type_filter(corpus):
+    assert _search(corpus, "get papers that mention turing") == ["a", "c"]
+    assert _search(corpus, "get papers that mention person turing") == ["a"]
+    assert _search(corpus, "get papers that mention work turing") == ["c"]
+
+def test_and_or(corpus):
+    assert _search(corpus, "get papers that mention turing and organisation technology") == ["a"]
+    assert _search(corpus, "get papers that mention person a_b or work turing") == ["b", "c"]
+    assert _search(corpus, "get one paper that mention turing") == ["a"]
+
+def test_like_wildcards_are_literal(corpus):
+    assert _search(corpus, "get papers that mention person a%") == []
+    assert _search(corpus, "get papers that mention person a_") == ["b"]
+
+def test_compiled_statement_is_shared_across_names():
+    first, first_params = paper_query.compile_query(paper_query.parse("get papers that mention abc or de"))
+    second, second_params = paper_query.compile_query(paper_query.parse("get papers that mention xyz or uv"))
+    assert first is second
+    assert first_params == {"name_0": '"abc"', "name_1": "%de%"}
+    assert second_params == {"name_0": '"xyz"', "name_1": "%uv%"}
+
+def test_entity_type_is_bound():
+    first, first_params = paper_query.compile_query(paper_query.parse("get papers that mention person abc"))
+    second, second_params = paper_query.compile_query(paper_query.parse("get papers that mention person xyz"))
+    assert first is second
+    assert "PERSON" not in str(first)
+    assert first_params == {"name_0": '"abc"', "entity_type_0": "PERSON"}
+    assert second_params == {"name_0": '"xyz"', "entity_type_0": "PERSON"}
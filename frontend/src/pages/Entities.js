@@ -1,22 +1,27 @@
 import React, { useState, useEffect } from 'react';
-import { Typography, Table, Card, Space, Tag, Tooltip } from 'antd';
+import { Typography, Table, Card, Space, Tag, Tooltip, Button, message } from 'antd';
 import { getEntities } from '../services/api';
 
 const { Title } = Typography;
 
+const PAGE_SIZE = 100;
+
 function Entities() {
   const [entities, setEntities] = useState([]);
   const [loading, setLoading] = useState(false);
+  const [hasMore, setHasMore] = useState(false);
 
   useEffect(() => {
     fetchEntities();
   }, []);
 
-  const fetchEntities = async () => {
+  // afterId 为空时重新加载第一页，否则追加下一页
+  const fetchEntities = async (afterId) => {
     setLoading(true);
     try {
-      const data = await getEntities();
-      setEntities(data);
+      const data = await getEntities(afterId, PAGE_SIZE);
+      setEntities((prev) => (afterId ? [...prev, ...data] : data));
+      setHasMore(data.length === PAGE_SIZE);
     } catch (error) {
       console.error('获取实体列表失败:', error);
       message.error('获取实体列表失败');
@@ -89,9 +94,17 @@ function Entities() {
           pagination={{
             total: entities.length,
             pageSize: 10,
-            showTotal: (total) => `共 ${total} 个实体`,
+            showTotal: (total) => `已加载 ${total} 个实体`,
           }}
         />
+        {hasMore && (
+          <Button
+            loading={loading}
+            onClick={() => fetchEntities(entities[entities.length - 1].entity_id)}
+          >
+            加载更多
+          </Button>
+        )}
       </Card>
     </Space>
   );
@@ -1,13 +1,28 @@
 import React, { useState, useEffect } from 'react';
-import { Typography, Upload, Button, Table, Card, Space, message, Tag, Popconfirm } from 'antd';
+import { Typography, Upload, Button, Table, Card, Space, message, Tag, Popconfirm, List, Progress } from 'antd';
 import { UploadOutlined, DeleteOutlined } from '@ant-design/icons';
-import { uploadPDF, getPapers, deletePaper } from '../services/api';
+import { uploadPDF, getPapers, deletePaper, getJob } from '../services/api';
 
 const { Title } = Typography;
 
+// 轮询任务状态：间隔从 1 秒开始逐步加倍，最长 15 秒；超过 30 分钟仍未结束视为超时
+const POLL_INITIAL_DELAY = 1000;
+const POLL_MAX_DELAY = 15000;
+const POLL_DEADLINE = 30 * 60 * 1000;
+// 连续多次查询失败（网络错误等）后放弃
+const POLL_MAX_FAILURES = 3;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
 function Papers() {
   const [papers, setPapers] = useState([]);
   const [loading, setLoading] = useState(false);
+  // 本页上传的文件及其后台任务状态：{ uid, name, status, progress, error }
+  const [uploads, setUploads] = useState([]);
+
+  const updateUpload = (uid, fields) => {
+    setUploads((items) => items.map((item) => (item.uid === uid ? { ...item, ...fields } : item)));
+  };
 
   useEffect(() => {
     fetchPapers();
@@ -83,31 +98,79 @@ function Papers() {
     },
   ];
 
+  // 轮询后台处理任务，直到完成、失败、超时或无法查询；不抛出异常，结果统一为任务状态对象
+  const waitForJob = async (jobId, onProgress) => {
+    const deadline = Date.now() + POLL_DEADLINE;
+    let delay = POLL_INITIAL_DELAY;
+    let failures = 0;
+    while (Date.now() < deadline) {
+      try {
+        const job = await getJob(jobId);
+        failures = 0;
+        if (job.status === 'done' || job.status === 'failed') {
+          return job;
+        }
+        onProgress(job);
+      } catch (error) {
+        // 任务不存在（如已被删除）时不再重试
+        if (error.response?.status === 404) {
+          return { status: 'failed', error: '任务不存在' };
+        }
+        failures += 1;
+        if (failures >= POLL_MAX_FAILURES) {
+          return { status: 'failed', error: '无法查询任务状态' };
+        }
+      }
+      await sleep(Math.min(delay, Math.max(deadline - Date.now(), 0)));
+      delay = Math.min(delay * 2, POLL_MAX_DELAY);
+    }
+    return { status: 'failed', error: '处理超时' };
+  };
+
   const handleUpload = async (file) => {
     const formData = new FormData();
     formData.append('file', file);
+    setUploads((items) => [
+      { uid: file.uid, name: file.name, status: 'uploading', progress: 0 },
+      ...items.filter((item) => item.uid !== file.uid),
+    ]);
     
+    let job;
     try {
-      await uploadPDF(formData);
-      message.success(`${file.name} 上传成功`);
-      fetchPapers(); // 刷新文档列表
-      return true;
+      job = await uploadPDF(formData);
     } catch (error) {
       console.error('上传失败:', error);
+      const detail = error.response?.data?.detail || error.message;
+      updateUpload(file.uid, { status: 'failed', error: detail });
       message.error(`${file.name} 上传失败`);
       return false;
     }
+
+    message.info(`${file.name} 已上传，正在后台处理`);
+    updateUpload(file.uid, { status: job.status, progress: job.progress });
+    const result = await waitForJob(job.job_id, (current) => {
+      updateUpload(file.uid, { status: current.status, progress: current.progress });
+    });
+    if (result.status === 'failed') {
+      updateUpload(file.uid, { status: 'failed', error: result.error });
+      message.error(`${file.name} 处理失败：${result.error || '未知错误'}`);
+      return false;
+    }
+    updateUpload(file.uid, { status: 'done', progress: 100 });
+    message.success(`${file.name} 处理完成`);
+    fetchPapers(); // 刷新文档列表
+    return true;
   };
 
   const uploadProps = {
     name: 'file',
     accept: '.pdf',
+    showUploadList: false,
     customRequest: async ({ file, onSuccess, onError }) => {
-      try {
-        await handleUpload(file);
+      if (await handleUpload(file)) {
         onSuccess();
-      } catch (error) {
-        onError(error);
+      } else {
+        onError(new Error(`${file.name} 处理失败`));
       }
     },
   };
@@ -120,6 +183,27 @@ function Papers() {
         <Upload {...uploadProps}>
           <Button icon={<UploadOutlined />}>选择PDF文件</Button>
         </Upload>
+        {uploads.length > 0 && (
+          <List
+            size="small"
+            dataSource={uploads}
+            rowKey="uid"
+            renderItem={(item) => (
+              <List.Item>
+                <Space direction="vertical" style={{ width: '100%' }}>
+                  <Space>
+                    {item.name}
+                    {item.status === 'failed' && <Tag color="red">失败：{item.error || '未知错误'}</Tag>}
+                    {item.status === 'done' && <Tag color="green">完成</Tag>}
+                  </Space>
+                  {item.status !== 'failed' && item.status !== 'done' && (
+                    <Progress percent={item.progress || 0} size="small" status="active" />
+                  )}
+                </Space>
+              </List.Item>
+            )}
+          />
+        )}
       </Card>
 
       <Card title="文档列表">
@@ -24,6 +24,17 @@ export const uploadPDF = async (formData) => {
   }
 };
 
+// 查询后台处理任务状态
+export const getJob = async (jobId) => {
+  try {
+    const response = await api.get(`/jobs/${jobId}`);
+    return response.data;
+  } catch (error) {
+    console.error('API Error:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
 // 获取论文列表
 export const getPapers = async () => {
   try {
@@ -46,10 +57,12 @@ export const getPaper = async (paperId) => {
   }
 };
 
-// 获取实体列表
-export const getEntities = async () => {
+// 获取实体列表（afterId 为上一页最后一个实体ID）
+export const getEntities = async (afterId, limit = 100) => {
   try {
-    const response = await api.get('/entities/');
+    const response = await api.get('/entities/', {
+      params: { after_id: afterId, limit },
+    });
     return response.data;
   } catch (error) {
     console.error('API Error:', error.response?.data || error.message);
@@ -61,7 +74,33 @@ export const getEntities = async () => {
 export const searchEntities = async (query, type) => {
   try {
     const response = await api.get('/entities/search/', {
-      params: { query, type },
+      params: { query, entity_type: type },
+    });
+    return response.data;
+  } catch (error) {
+    console.error('API Error:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
+// 实体名称自动补全
+export const suggestEntities = async (prefix, type, limit = 10) => {
+  try {
+    const response = await api.get('/entities/suggest/', {
+      params: { prefix, entity_type: type, limit },
+    });
+    return response.data;
+  } catch (error) {
+    console.error('API Error:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
+// 全文检索论文
+export const searchFulltext = async (q, limit = 20) => {
+  try {
+    const response = await api.get('/papers/fulltext/', {
+      params: { q, limit },
     });
     return response.data;
   } catch (error) {
@@ -70,6 +109,17 @@ export const searchEntities = async (query, type) => {
   }
 };
 
+// 获取实体统计信息
+export const getStatistics = async () => {
+  try {
+    const response = await api.get('/statistics/');
+    return response.data;
+  } catch (error) {
+    console.error('API Error:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
 // 获取知识图谱数据
 export const getKnowledgeGraph = async () => {
   try {
@@ -81,6 +131,70 @@ export const getKnowledgeGraph = async () => {
   }
 };
 
+// 获取某个节点（p<论文ID> 或 e<实体ID>）的邻域子图
+export const getGraphNeighborhood = async (node, options = {}) => {
+  try {
+    const response = await api.get('/graph/neighborhood/', {
+      params: { node, ...options },
+    });
+    return response.data;
+  } catch (error) {
+    console.error('API Error:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
+// 获取论文中实体出现的位置，options 可包含 entity_id、after、limit
+// 偏移相对于 getPaperParagraphs 返回的段落文本拼接后的全文
+export const getPaperMentions = async (paperId, options = {}) => {
+  try {
+    const response = await api.get(`/papers/${paperId}/mentions/`, {
+      params: options,
+    });
+    return response.data;
+  } catch (error) {
+    console.error('API Error:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
+// 按块读取论文简化文档的 [from, to) 范围
+export const getPaperContent = async (paperId, from = 0, to) => {
+  try {
+    const response = await api.get(`/papers/${paperId}/content`, {
+      params: { from, to },
+    });
+    return response.data;
+  } catch (error) {
+    console.error('API Error:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
+// 读取实体识别所用段落文本的 [from, to) 范围，每段带有在全文中的起始偏移 start_char
+export const getPaperParagraphs = async (paperId, from = 0, to) => {
+  try {
+    const response = await api.get(`/papers/${paperId}/paragraphs`, {
+      params: { from, to },
+    });
+    return response.data;
+  } catch (error) {
+    console.error('API Error:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
+// 批量删除论文，criteria 可包含 paper_ids、name_prefix、query
+export const bulkDeletePapers = async (criteria) => {
+  try {
+    const response = await api.post('/papers/bulk-delete/', criteria);
+    return response.data;
+  } catch (error) {
+    console.error('API Error:', error.response?.data || error.message);
+    throw error;
+  }
+};
+
 export const deletePaper = async (paperId) => {
   const response = await fetch(`${API_BASE_URL}/papers/${paperId}`, {
     method: 'DELETE',